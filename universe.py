@@ -1,8 +1,27 @@
 #
 import datetime
-from typing import List, Set
+from typing import Dict, List, Set
 from enum import Enum
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableSet
+import bisect
+import concurrent.futures
+import heapq
+import io
+import itertools
+import json
+import mmap
+import multiprocessing
+import operator
+import os
 import pickle
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+import zlib
 
 
 class Gender(Enum):
@@ -100,10 +119,628 @@ class HairColor(Enum):
     ginger: str = 'ginger'
 
 
+class EmotionSet(MutableSet):
+    """
+    EmotionSet class - a (live) set-view of the emotions an animal feels, which
+    are held as bits of a single int (one bit per Emotion)
+    """
+    __bits__: Dict[Emotion, int] = {
+        emotion: 1 << bit for bit, emotion in enumerate(Emotion)}
+    __slots__ = ('__owner__',)
+
+    def __init__(self, owner: 'Animal'):
+        self.__owner__ = owner
+
+    @staticmethod
+    def mask_of(emotions) -> int:
+        mask = 0
+        for emotion in emotions:
+            assert isinstance(emotion, Emotion), 'invalid emotion'
+            mask |= EmotionSet.__bits__[emotion]
+        return mask
+
+    @staticmethod
+    def emotions_of(mask: int) -> List[Emotion]:
+        return [emotion for emotion, bit in EmotionSet.__bits__.items() if mask & bit]
+
+    def __contains__(self, emotion) -> bool:
+        bit = EmotionSet.__bits__.get(emotion, 0)
+        return bit != 0 and self.__owner__.emotion_mask & bit != 0
+
+    def __iter__(self):
+        return iter(EmotionSet.emotions_of(self.__owner__.emotion_mask))
+
+    def __len__(self) -> int:
+        return self.__owner__.emotion_mask.bit_count()
+
+    def add(self, emotion: Emotion):
+        self.__owner__.add_emotion(emotion)
+
+    def discard(self, emotion: Emotion):
+        if emotion in self:
+            self.__owner__.remove_emotion(emotion)
+
+    def __repr__(self) -> str:
+        return repr(set(self))
+
+
+class ActionRetention:
+    """
+    ActionRetention class - how many actions each individual keeps in memory,
+    and the directory where their older actions are spilled to
+    """
+
+    def __init__(self, keep_last: int, directory: str, spill_batch: int = 256):
+        assert isinstance(keep_last, int) and keep_last > 0, 'invalid keep-last count'
+        assert isinstance(directory, str) and directory.strip() != '', 'invalid directory'
+        assert isinstance(spill_batch, int) and spill_batch > 0, 'invalid spill batch size'
+        #
+        self.__keep_last__ = keep_last
+        # (absolute - so that spilled histories still find it if the working
+        #  directory changes)
+        self.__directory__ = os.path.abspath(directory.strip())
+        # spill only once this many actions have built up beyond keep_last - so
+        #  that we are not writing a segment for every single action
+        self.__spill_batch__ = spill_batch
+        os.makedirs(self.__directory__, exist_ok=True)
+
+    @property
+    def keep_last(self) -> int: return self.__keep_last__
+    @property
+    def directory(self) -> str: return self.__directory__
+    @property
+    def spill_batch(self) -> int: return self.__spill_batch__
+
+
+class ActionHistory:
+    """
+    ActionHistory class - a compact, append-only record of an animal's actions
+
+    Each action is held as a small integer code, with its arguments as codes into
+    a string-table shared by all histories (so each distinct name, unit etc. is stored
+    once), and any measured quantity (e.g. a distance) is kept as a number. Free text
+    (e.g. what was said) is not shared - it is held by the history itself, so it goes
+    when spilled, or when the history does. The (Action, *strings) tuples are only
+    re-built when read.
+
+    With an ActionRetention set, only the most recent actions stay in memory - older
+    ones are appended (as segments) to a file, and read back lazily. The file is ours
+    alone (a saved history holds all its actions), so it is deleted when we are, or
+    when our retention is cleared - our actions then all being read back in.
+
+    Every action is time-stamped (from ActionHistory's clock - wall-clock seconds
+    by default, or e.g. a simulation tick) in a sorted column, so time-windows are
+    found by binary search.
+    """
+    __actions__: List[Action] = list(Action)
+    __action_codes__: Dict[Action, int] = {
+        action: code for code, action in enumerate(Action)}
+    # every distinct argument-string (bar free text), shared by all histories
+    __strings__: List[str] = []
+    __string_codes__: Dict[str, int] = {}
+    # the actions whose arguments are free text
+    __free_text_actions__: Set[Action] = frozenset([Action.spoke])
+    # the actions whose argument is a measured quantity (with its units)
+    __measured_actions__: Set[Action] = frozenset([Action.crawled, Action.walked, Action.ran])
+    # where the time-stamps come from
+    __clock__ = time.time
+    #
+    __slots__ = ('__codes__', '__arg_offsets__', '__args__', '__numbers__', '__texts__',
+                 '__times__', '__retention__', '__segment_file__', '__segments__',
+                 '__spilled_count__', '__finalizer__', '__weakref__')
+
+    def __init__(self):
+        # one action-code per action
+        self.__codes__ = array('B')
+        # where each action's arguments start (and end) in __args__
+        self.__arg_offsets__ = array('I', [0])
+        # 2 * a string-code, 2 * a position in __texts__ + 1 (for free text) or, for a
+        #  measured quantity, a negative code into __numbers__ (the quantity is always
+        #  followed by the string-code of its units)
+        self.__args__ = array('i')
+        self.__numbers__ = array('d')
+        self.__texts__: List[str] = []
+        # when each action happened - never decreasing
+        self.__times__ = array('d')
+        self.__retention__: ActionRetention = None
+        # the file our older actions are spilled to, and the (offset, length, count,
+        #  first-time, last-time) of each segment written to it so far
+        self.__segment_file__: str = None
+        self.__segments__: List[tuple] = []
+        self.__spilled_count__: int = 0
+        # deletes our segment file - when we are, or our retention is cleared
+        self.__finalizer__: weakref.finalize = None
+
+    @classmethod
+    def set_clock(cls, clock):
+        """
+        time-stamp all (subsequent) actions using clock() - e.g. a simulation tick
+        """
+        assert callable(clock), 'clock must be a function/method'
+        cls.__clock__ = clock
+
+    # the clock may go backwards (e.g. wall-clock adjustments) but our times must not
+    def __stamp__(self):
+        now = ActionHistory.__clock__()
+        if len(self.__times__) > 0 and now < self.__times__[-1]:
+            now = self.__times__[-1]
+        elif len(self.__times__) == 0 and len(self.__segments__) > 0:
+            now = max(now, self.__segments__[-1][4])
+        self.__times__.append(now)
+
+    @classmethod
+    def __string_code__(cls, string: str) -> int:
+        code = cls.__string_codes__.get(string)
+        if code is None:
+            code = len(cls.__strings__)
+            cls.__strings__.append(string)
+            cls.__string_codes__[string] = code
+        return code
+
+    def __append_args__(self, action: Action, strings):
+        self.__codes__.append(ActionHistory.__action_codes__[action])
+        if action in ActionHistory.__free_text_actions__:
+            for string in strings:
+                self.__args__.append(2 * len(self.__texts__) + 1)
+                self.__texts__.append(string)
+        else:
+            for string in strings:
+                self.__args__.append(2 * ActionHistory.__string_code__(string))
+        self.__arg_offsets__.append(len(self.__args__))
+
+    def append(self, action: Action, *strings):
+        self.__append_args__(action, strings)
+        self.__stamp__()
+        self.__retain__()
+
+    # (as append) but stamped as at when - e.g. when replaying a journal
+    def append_at(self, when: float, action: Action, *strings):
+        self.__append_args__(action, strings)
+        self.__stamp_at__(when)
+        self.__retain__()
+
+    def __stamp_at__(self, when: float):
+        self.__times__.append(max(when, self.__times__[-1]) if len(self.__times__) > 0 else when)
+
+    def __append_measure__(self, action: Action, quantity: float, units: str):
+        # ints and floats are both held as doubles - the low bit remembers which it was
+        #  so that it reads back exactly as str(quantity) would have
+        number_code = 2 * len(self.__numbers__) + \
+            (1 if isinstance(quantity, int) else 0)
+        self.__numbers__.append(quantity)
+        self.__codes__.append(ActionHistory.__action_codes__[action])
+        self.__args__.append(-number_code - 1)
+        self.__args__.append(2 * ActionHistory.__string_code__(units))
+        self.__arg_offsets__.append(len(self.__args__))
+
+    def append_measure(self, action: Action, quantity: float, units: str):
+        self.__append_measure__(action, quantity, units)
+        self.__stamp__()
+        self.__retain__()
+
+    # an action as an "entry" - (Action, *strings), but with a measured quantity as
+    #  (quantity, units) rather than the 'quantity units' string it reads as - so that
+    #  it can be re-built exactly as it was (see append_entry)
+    @staticmethod
+    def entry_of(action: tuple) -> tuple:
+        if action[0] not in ActionHistory.__measured_actions__ or len(action) != 2 or \
+                not isinstance(action[1], str):
+            return action
+        quantity, _, units = action[1].partition(' ')
+        try:
+            # (str() of a float always has a '.', 'e', 'inf' or 'nan' - of an int, never)
+            quantity = float(quantity) if any(
+                letter in quantity for letter in '.en') else int(quantity)
+        except ValueError:
+            return action
+        return (action[0], quantity, units)
+
+    # whether an entry is (action, quantity, units) - its quantity a number
+    @staticmethod
+    def is_measure(entry: tuple) -> bool:
+        return len(entry) == 3 and entry[0] in ActionHistory.__measured_actions__ and \
+            not isinstance(entry[1], str)
+
+    def entries_since(self, start: int) -> List[tuple]:
+        """
+        the (time, entry) of each action from position start on - see entry_of
+        """
+        return [(when, ActionHistory.entry_of(action)) for when, action in self.since(start)]
+
+    def append_entry(self, when: float, action: Action, *args):
+        """
+        append an entry (see entry_of - or a plain action) stamped as at when, its
+        quantity (if measured) held as a number
+        """
+        entry = ActionHistory.entry_of((action, *args))
+        if ActionHistory.is_measure(entry):
+            self.__append_measure__(*entry)
+            self.__stamp_at__(when)
+            self.__retain__()
+        else:
+            self.append_at(when, *entry)
+
+    def set_retention(self, retention: ActionRetention):
+        assert retention is None or isinstance(
+            retention, ActionRetention), 'invalid action retention'
+        self.__retention__ = retention
+        if retention is None and self.__segments__:
+            # (read back in - and the segment file deleted)
+            self.__setstate__(self.__getstate__())
+        self.__retain__()
+
+    @property
+    def in_memory_count(self) -> int:
+        return len(self.__codes__)
+
+    def __retain__(self):
+        retention = self.__retention__
+        if retention is None:
+            return
+        if len(self.__codes__) < retention.keep_last + retention.spill_batch:
+            return
+        self.__spill__(len(self.__codes__) - retention.keep_last)
+
+    # append the oldest count (in-memory) actions to our segment file, and drop them
+    def __spill__(self, count: int):
+        if self.__segment_file__ is None:
+            self.__segment_file__ = os.path.join(
+                self.__retention__.directory, uuid.uuid4().hex + '.actions')
+            self.__finalizer__ = weakref.finalize(
+                self, ActionHistory.__remove_segment_file__, self.__segment_file__)
+        times = self.__times__[:count]
+        payload = pickle.dumps(([self.__decode__(index)
+                                 for index in range(count)], times))
+        with open(self.__segment_file__, 'ab') as segment_file:
+            offset = segment_file.tell()
+            segment_file.write(payload)
+        self.__segments__.append(
+            (offset, len(payload), count, times[0], times[-1]))
+        self.__spilled_count__ += count
+        #
+        # now drop them from the columns - the remaining numbers (and texts) are a
+        #  suffix of __numbers__ (and __texts__) so their codes just shift down
+        args_start = self.__arg_offsets__[count]
+        args = self.__args__[args_start:]
+        first_number = next((-code - 1 for code in args if code < 0), None)
+        number_shift = 0
+        if first_number is None:
+            self.__numbers__ = array('d')
+        else:
+            numbers_start = first_number >> 1
+            self.__numbers__ = self.__numbers__[numbers_start:]
+            number_shift = 2 * numbers_start
+        first_text = next((code >> 1 for code in args if code >= 0 and code & 1), None)
+        text_shift = 0
+        if first_text is None:
+            self.__texts__ = []
+        else:
+            self.__texts__ = self.__texts__[first_text:]
+            text_shift = 2 * first_text
+        if number_shift or text_shift:
+            args = array('i', [code + number_shift if code < 0 else
+                               code - text_shift if code & 1 else code for code in args])
+        self.__args__ = args
+        self.__codes__ = self.__codes__[count:]
+        self.__times__ = self.__times__[count:]
+        self.__arg_offsets__ = array(
+            'I', [offset - args_start for offset in self.__arg_offsets__[count:]])
+
+    # (it may be gone already - e.g. along with its directory)
+    @staticmethod
+    def __remove_segment_file__(filename: str):
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
+
+    # the (actions, times) of a spilled segment
+    def __read_segment__(self, segment: tuple) -> tuple:
+        offset, length = segment[0], segment[1]
+        with open(self.__segment_file__, 'rb') as segment_file:
+            segment_file.seek(offset)
+            return pickle.loads(segment_file.read(length))
+
+    def __spilled_action__(self, index: int) -> tuple:
+        for segment in self.__segments__:
+            if index < segment[2]:
+                return self.__read_segment__(segment)[0][index]
+            index -= segment[2]
+        raise IndexError('action history index out of range')
+
+    def between(self, start: float = None, end: float = None):
+        """
+        the (time, action) of each action from start (inclusive) up to end (exclusive)
+        - in time order. Spilled segments outside the window are not read at all
+        """
+        start = float('-inf') if start is None else start
+        end = float('inf') if end is None else end
+        for segment in self.__segments__:
+            if segment[4] < start or segment[3] >= end:
+                continue
+            actions, times = self.__read_segment__(segment)
+            first = bisect.bisect_left(times, start)
+            last = bisect.bisect_left(times, end)
+            for index in range(first, last):
+                yield times[index], actions[index]
+        first = bisect.bisect_left(self.__times__, start)
+        last = bisect.bisect_left(self.__times__, end)
+        for index in range(first, last):
+            yield self.__times__[index], self.__decode__(index)
+
+    @staticmethod
+    def merged_between(individuals, start: float = None, end: float = None):
+        """
+        the (time, individual, action) of the actions of all the individuals
+        (Animals) in the time-window - merged into a single time-ordered stream
+        """
+        def timed(individual):
+            for when, action in individual.all_actions.between(start, end):
+                yield when, individual, action
+        return heapq.merge(*[timed(individual) for individual in individuals],
+                           key=lambda entry: entry[0])
+
+    def __decode__(self, index: int) -> tuple:
+        strings = ActionHistory.__strings__
+        args = []
+        position = self.__arg_offsets__[index]
+        end = self.__arg_offsets__[index + 1]
+        while position < end:
+            code = self.__args__[position]
+            position += 1
+            if code >= 0:
+                args.append(self.__texts__[code >> 1] if code & 1 else strings[code >> 1])
+                continue
+            number_code = -code - 1
+            quantity = self.__numbers__[number_code >> 1]
+            if number_code & 1:
+                quantity = int(quantity)
+            args.append(str(quantity) + ' ' + strings[self.__args__[position] >> 1])
+            position += 1
+        return (ActionHistory.__actions__[self.__codes__[index]], *args)
+
+    def since(self, start: int) -> List[tuple]:
+        """
+        the (time, action) of each action from position start on
+        """
+        if start >= self.__spilled_count__:
+            first = start - self.__spilled_count__
+            return [(self.__times__[index], self.__decode__(index))
+                    for index in range(first, len(self.__codes__))]
+        return list(itertools.islice(self.between(), start, None))
+
+    def __len__(self) -> int:
+        return self.__spilled_count__ + len(self.__codes__)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1 and start >= self.__spilled_count__:
+                return [self.__decode__(i - self.__spilled_count__) for i in range(start, stop)]
+            actions = list(self)
+            return actions[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('action history index out of range')
+        if index < self.__spilled_count__:
+            return self.__spilled_action__(index)
+        return self.__decode__(index - self.__spilled_count__)
+
+    # the spilled segments are read one at a time, as we get to them
+    def __iter__(self):
+        for segment in self.__segments__:
+            yield from self.__read_segment__(segment)[0]
+        for index in range(len(self.__codes__)):
+            yield self.__decode__(index)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+    # (older saved worlds never recorded when the actions happened - so they are
+    #  all stamped as at the start of time)
+    @classmethod
+    def from_actions(cls, actions) -> 'ActionHistory':
+        history = cls()
+        for action in actions:
+            history.append(*action)
+        history.__times__ = array('d', [0.0] * len(history.__codes__))
+        return history
+
+    # for pickling - the shared string-table is not saved, so carry just the
+    #  strings we use (and re-code them when loaded). Any spilled actions are
+    #  read back in - the segment file is not shared
+    def __getstate__(self):
+        if self.__segments__:
+            whole = ActionHistory()
+            for when, entry in self.entries_since(0):
+                whole.append_entry(when, *entry)
+            return whole.__getstate__()
+        local_codes: Dict[int, int] = {}
+        strings: List[str] = []
+        args = array('i')
+        for code in self.__args__:
+            if code >= 0 and not code & 1:
+                if code not in local_codes:
+                    local_codes[code] = 2 * len(strings)
+                    strings.append(ActionHistory.__strings__[code >> 1])
+                code = local_codes[code]
+            args.append(code)
+        return {'strings': strings, 'codes': self.__codes__,
+                'arg_offsets': self.__arg_offsets__, 'args': args,
+                'numbers': self.__numbers__,
+                'texts': self.__texts__,
+                'times': self.__times__}
+
+    def __setstate__(self, state):
+        string_codes = [2 * ActionHistory.__string_code__(
+            string) for string in state['strings']]
+        self.__codes__ = state['codes']
+        self.__arg_offsets__ = state['arg_offsets']
+        if 'texts' in state:
+            self.__args__ = array('i', [string_codes[code >> 1] if code >= 0 and not code & 1
+                                        else code for code in state['args']])
+            self.__texts__ = state['texts']
+        else:
+            # (saved before free text was held apart - every string was shared)
+            self.__args__ = array('i', [string_codes[code] if code >= 0 else code
+                                        for code in state['args']])
+            self.__texts__ = []
+        self.__numbers__ = state['numbers']
+        self.__times__ = state.get('times', array('d', [0.0] * len(self.__codes__)))
+        # the retention is re-applied by the world we belong to
+        self.__retention__ = None
+        finalizer = getattr(self, '__finalizer__', None)
+        self.__finalizer__ = None
+        self.__segment_file__ = state.get('segment_file')
+        self.__segments__ = state.get('segments', [])
+        self.__spilled_count__ = sum(
+            [segment[2] for segment in self.__segments__])
+        if finalizer is not None:
+            # (what we had spilled is in state)
+            finalizer()
+        if self.__segments__:
+            # (saved when spilled actions were left in a (shared) segment file)
+            self.__setstate__(self.__getstate__())
+
+
+class Batch:
+    """
+    Batch class - while (any) batch is open, the change-callbacks of animals,
+    families, communities and worlds are deferred; when the outermost batch
+    closes, each distinct callback is fired once, in the order first deferred
+    e.g. (the family's members-updated callback is then fired once, however many
+    children are added - its community's callbacks are not fired at all, as its
+    families are unchanged)
+        with world.batch():
+            for child in children:
+                family.child_add(child)
+    """
+    # the callbacks deferred so far - None when no batch is open
+    __pending__: Dict = None
+    __depth__: int = 0
+
+    @staticmethod
+    def fire(callback: callable):
+        if Batch.__pending__ is None:
+            callback()
+            return
+        try:
+            Batch.__pending__.setdefault(callback, callback)
+        except TypeError:
+            # not hashable - fall back to its identity
+            Batch.__pending__.setdefault(id(callback), callback)
+
+    @staticmethod
+    def is_open() -> bool: return Batch.__pending__ is not None
+
+    def __enter__(self) -> 'Batch':
+        if Batch.__depth__ == 0:
+            Batch.__pending__ = dict()
+        Batch.__depth__ += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        Batch.__depth__ -= 1
+        if Batch.__depth__ > 0:
+            return False
+        pending = Batch.__pending__
+        # callbacks fired from here on (including by these ones) are not deferred
+        Batch.__pending__ = None
+        for callback in pending.values():
+            callback()
+        return False
+
+
+class Ingest:
+    """
+    Ingest class - while an ingest of a world is open, the world (and its communities
+    and families) trust their callers: the checks each add/add_many makes are skipped,
+    and instead the world is checked once, when its outermost ingest closes - every
+    problem found being reported together (as an AssertionError). Callbacks are deferred
+    (as by a Batch), and fired as the ingest closes - rejected or not.
+
+    A rejected ingest is not undone: its adds stay made (and their callbacks fired, so
+    that what shows the world shows it as it is), leaving the world inconsistent - to
+    be discarded, or re-loaded
+    e.g.
+        with world.ingest():
+            for child in children:
+                family.child_add(child)
+    """
+
+    def __init__(self, world: 'World'):
+        self.__world__: 'World' = world
+        self.__batch__: Batch = Batch()
+
+    # whether world (which may be None) is being ingested
+    @staticmethod
+    def trusts(world: 'World') -> bool:
+        return world is not None and world.__ingest_depth__ > 0
+
+    def __enter__(self) -> 'Ingest':
+        self.__batch__.__enter__()
+        self.__world__.__ingest_depth__ += 1
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        world = self.__world__
+        world.__ingest_depth__ -= 1
+        self.__batch__.__exit__(exc_type, *exc_info)
+        if world.__ingest_depth__ > 0 or exc_type is not None:
+            return False
+        violations = world.violations()
+        assert not violations, world.name + ' world is inconsistent:\n' + \
+            '\n'.join(violations)
+        return False
+
+
 class Animal:
     """
     Animal class - parent class for all animals
     """
+    # species-constant traits - shared by every individual of a kind, so they
+    #  live on the class (each kind of animal overrides its own) rather than per-instance
+    __leg_count__: int = 0
+    __has_tail__: bool = False
+    __is_fluffy__: bool = False
+    __wags_tail__: bool = False
+    __has_scales__: bool = False
+    __has_gills__: bool = False
+    __is_mammal__: bool = False
+    __has_paws__: bool = False
+    __has_feathers__: bool = False
+    __can_fly__: bool = False
+    __makes_sound__: str = 'silence'
+    __can_lay_eggs__: bool = False
+    __has_hair__: bool = False
+    __can_change_hair_color__: bool = False
+    __distance_units__: str = 'km'
+    __crawling_tiredness_distance__: float = 0.1
+    __walking_tiredness_distance__: float = 5.0
+    __running_tiredness_distance__: float = 1.0
+    #
+    # the per-individual state
+    __slots__ = ('__breathes__', '__is_wild__', '__gender__', '__animal_type__',
+                 '__given_name__', '__family_id__', '__hair_color__', '__eye_color__',
+                 '__is_injured__', '__injury__', '__is_ill__', '__illness__',
+                 '__distance_travelled__', '__action_history__', '__is_clean__',
+                 '__is_wet__', '__is_tired__', '__is_cold__', '__is_sweating__',
+                 '__emotions__', '__has_healing_touch__', '__words_spoken_count__',
+                 '__dob__', '__property_updated_callback__',
+                 '__notify_container_callback__', '__world__', '__pet_family__',
+                 '__weakref__')
+    # class -> all the slot-names of that class (including inherited ones)
+    __slot_names_by_class__: Dict[type, List[str]] = {}
+
+    @classmethod
+    def __slot_names__(cls) -> List[str]:
+        if cls not in Animal.__slot_names_by_class__:
+            names = [name for klass in reversed(cls.__mro__)
+                     for name in klass.__dict__.get('__slots__', ())
+                     if name != '__weakref__']
+            Animal.__slot_names_by_class__[cls] = names
+        return Animal.__slot_names_by_class__[cls]
 
     def __init__(self, age: int = None,
                  dob: datetime.datetime = None,
@@ -128,23 +765,9 @@ class Animal:
         self.__breathes__: bool = True
         self.__is_wild__: bool = True
         self.__gender__: Gender = gender
-        self.__leg_count__: int = 0
-        self.__has_tail__: bool = False
-        self.__is_fluffy__: bool = False
-        self.__wags_tail__: bool = False
-        self.__has_scales__: bool = False
-        self.__has_gills__: bool = False
-        self.__is_mammal__: bool = False
         self.__animal_type__ = type
-        self.__has_paws__: bool = False
-        self.__has_feathers__: bool = False
-        self.__can_fly__: bool = False
-        self.__makes_sound__: str = 'silence'
-        self.__can_lay_eggs__: bool = False
         self.__given_name__: str = name if name is None else name.strip()
         self.__family_id__: int = None
-        self.__has_hair__: bool = False
-        self.__can_change_hair_color__: bool = False
         self.__hair_color__: str = hair_color
         self.__eye_color__: str = eye_color
         self.__is_injured__: bool = False
@@ -152,19 +775,21 @@ class Animal:
         self.__is_ill__: bool = False
         self.__illness__: str = None
         self.__distance_travelled__: float = 0.0
-        self.__action_history__: List[(Action, *str)] = []
+        self.__action_history__: ActionHistory = ActionHistory()
         self.__is_clean__: bool = True
         self.__is_wet__: bool = False
         self.__is_tired__: bool = False
-        self.__distance_units__: str = 'km'
-        self.__crawling_tiredness_distance__: float = 0.1
-        self.__walking_tiredness_distance__: float = 5.0
-        self.__running_tiredness_distance__: float = 1.0
         self.__is_cold__: bool = False
         self.__is_sweating__: bool = False
-        self.__emotions__: Set[Emotion] = set()
+        # a bit per Emotion felt
+        self.__emotions__: int = 0
         self.__has_healing_touch__: bool = is_healer
         self.__words_spoken_count__: int = 0
+        # the world we are (currently) a member of - it keeps its indexes current
+        #  as we act
+        self.__world__: 'World' = None
+        # (pets only) the family we belong to - it tells its world as we act
+        self.__pet_family__: 'Family' = None
 
         #
         if dob != None:
@@ -178,6 +803,40 @@ class Animal:
             self.__dob__ = None
             message(self.name or self.animal_type,
                     'created without date-of-birth')
+
+    # for pickling - there is no __dict__, so gather up the slots
+    def __getstate__(self):
+        state = {}
+        for name in self.__slot_names__():
+            if hasattr(self, name):
+                state[name] = getattr(self, name)
+        state.pop('__property_updated_callback__', None)
+        state.pop('__notify_container_callback__', None)
+        # our world (or, for a pet, family) re-attaches itself when it is un-pickled
+        state.pop('__world__', None)
+        state.pop('__pet_family__', None)
+        return state
+
+    def __setstate__(self, state):
+        # older saved worlds pickled the (un-slotted) __dict__ - which also held
+        #  the species-traits, now on the class, so only restore our slots
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **state[1]}
+        slot_names = self.__slot_names__()
+        for name, value in state.items():
+            if name in slot_names:
+                setattr(self, name, value)
+        if not hasattr(self, '__words_spoken_count__'):
+            self.__words_spoken_count__ = 0
+        self.__world__ = None
+        self.__pet_family__ = None
+        # older saved worlds kept the emotions as a set
+        if isinstance(self.__emotions__, set):
+            self.__emotions__ = EmotionSet.mask_of(self.__emotions__)
+        # older saved worlds kept the action history as a list of tuples
+        if isinstance(self.__action_history__, list):
+            self.__action_history__ = ActionHistory.from_actions(
+                self.__action_history__)
     #
     @property
     def name(self) -> str: return self.__given_name__
@@ -205,12 +864,7 @@ class Animal:
         self.prop_callback()
 
     @property
-    def words_spoken_count(self) -> int:
-        try:
-            return self.__words_spoken_count__
-        except AttributeError:
-            self.__words_spoken_count__ = 0
-            return self.__words_spoken_count__
+    def words_spoken_count(self) -> int: return self.__words_spoken_count__
 
     @property
     def is_wild(self) -> bool: return self.__is_wild__
@@ -249,11 +903,25 @@ class Animal:
     def age(self) -> int:
         assert self.dob is not None, self.name or self.__animal_type__ + \
             ' has no recorded date-of-birth - cannot get age'
-        now = datetime.datetime.now()
-        years_diff = now.year - self.dob.year
-        if now.month < self.dob.month or now.day < self.dob.day:
-            return years_diff - 1
-        return years_diff
+        return (Animal.__date_key__(datetime.datetime.now()) - Animal.__date_key__(self.dob)) // 10000
+
+    # a date as the integer yyyymmdd - so that (as-of - dob) // 10000 is an age in
+    #  (completed) years, birthdays and leap-years included
+    @staticmethod
+    def __date_key__(date: datetime.date) -> int:
+        return date.year * 10000 + date.month * 100 + date.day
+
+    @staticmethod
+    def ages_of(individuals, as_of: datetime.date = None) -> array:
+        """
+        the ages of all the individuals (in order) as at as_of (by default, now) -
+        all against the one reference date
+        """
+        assert as_of is None or isinstance(as_of, datetime.date), 'invalid as-of date'
+        as_of_key = Animal.__date_key__(as_of or datetime.datetime.now())
+        dob_keys = array('l', [Animal.__date_key__(individual.dob)
+                               for individual in individuals])
+        return array('l', [(as_of_key - dob_key) // 10000 for dob_key in dob_keys])
 
     @property
     def has_paws(self) -> bool: return self.__has_paws__
@@ -309,30 +977,38 @@ class Animal:
             return
         if self.__property_updated_callback__ is None:
             return
-        self.__property_updated_callback__()
+        Batch.fire(self.__property_updated_callback__)
 
     def set_notify_container(self, callback):
         assert callable(callback), 'callback must be a function/method'
         self.__notify_container_callback__ = callback
 
+    def batch(self) -> Batch:
+        """
+        a context deferring (and de-duplicating) change-callbacks until it closes
+        """
+        return Batch()
+
     def notify_container(self):
         if not hasattr(self, '__notify_container_callback__'):
             return
         if self.__notify_container_callback__ is None:
             return
-        self.__notify_container_callback__()
+        Batch.fire(self.__notify_container_callback__)
 
     # this should not really be a public method - should only be called from the
     #  Family.pet_add() etc. methods - to ensure a valid family_id is passed
-    def make_pet(self, family_id: int, name: str = None):
-        assert not isinstance(self, Person), self.name or self.animal_type + \
-            ' is a person - slavery not supported'
-        assert not self.is_pet, self.animal_type + \
-            ' is already a pet called' + self.name
-        assert ((isinstance(name, str) and name.strip() != '')
-                or
-                (isinstance(self.name, str) and self.name != '')), 'invalid pet name'
-        assert isinstance(family_id, int), 'invalid family ID'
+    #  (trusted when that family's world is being ingested)
+    def make_pet(self, family_id: int, name: str = None, trusted: bool = False):
+        if not trusted:
+            assert not isinstance(self, Person), self.name or self.animal_type + \
+                ' is a person - slavery not supported'
+            assert not self.is_pet, self.animal_type + \
+                ' is already a pet called' + self.name
+            assert ((isinstance(name, str) and name.strip() != '')
+                    or
+                    (isinstance(self.name, str) and self.name != '')), 'invalid pet name'
+            assert isinstance(family_id, int), 'invalid family ID'
         #
         self.__is_wild__ = False
         if name is not None:
@@ -345,6 +1021,7 @@ class Animal:
             self, Person), self.animal_type + ' cannot be a pet anyway'
         assert self.is_pet, self.animal_type + ' is not a pet anyway'
         self.__family_id__ = None
+        self.__pet_family__ = None
         self.__is_wild__ = True
         self.add_action(Action.returned_to_wild)
 
@@ -397,7 +1074,9 @@ class Animal:
     def is_ill(self) -> bool: return self.__is_ill__
     @property
     def illness(self) -> str: return self.__illness__
-    def gets_ill(self): self.__is_ill__ = True
+    def gets_ill(self):
+        self.__is_ill__ = True
+        self.__state_changed__()
 
     def contracted_illness(self, illness: str):
         assert isinstance(illness, str), 'invalid illnes'
@@ -420,6 +1099,7 @@ class Animal:
                           ) and distance >= 0, 'invalid distance'
         distance *= 1.0
         self.__distance_travelled__ += distance
+        self.__state_changed__()
 
     @property
     def last_action(self) -> str:
@@ -427,23 +1107,55 @@ class Animal:
             return self.__action_history__[-1]
         return None
 
+    # a (read-only) sequence of (Action, *strings) tuples
     @property
-    def all_actions(self) -> List:
+    def all_actions(self) -> ActionHistory:
         return self.__action_history__
 
+    # for changes of state that are not (or not yet) recorded as an action - so
+    #  that our world can keep its indexes current
+    def __state_changed__(self):
+        if self.__world__ is not None:
+            self.__world__.__member_changed__(self)
+        elif self.__pet_family__ is not None:
+            self.__pet_family__.__changed__()
+
     def add_action(self, action: Action, *strings):
         assert isinstance(action, Action), 'invalid action'
         for s in strings:
             assert isinstance(s, str), 'invalid string'
-        self.__action_history__.append((action, *strings))
+        self.__action_history__.append(action, *strings)
+        if self.__world__ is not None:
+            self.__world__.__action_recorded__(self, action)
+        elif self.__pet_family__ is not None:
+            self.__pet_family__.__changed__()
+
+    def actions_between(self, start: float = None, end: float = None):
+        """
+        the (time, action) of each of our actions from start up to (not including) end
+        """
+        return self.__action_history__.between(start, end)
+
+    # only the most recent actions are kept in memory, older ones are spilled to file
+    #  (None to keep them all in memory)
+    def set_action_retention(self, retention: ActionRetention):
+        self.__action_history__.set_retention(retention)
+
+    # for actions with a measured quantity - e.g. the distance moved
+    def __add_measured_action__(self, action: Action, quantity: float):
+        self.__action_history__.append_measure(
+            action, quantity, self.__distance_units__)
+        if self.__world__ is not None:
+            self.__world__.__action_recorded__(self, action)
+        elif self.__pet_family__ is not None:
+            self.__pet_family__.__changed__()
 
     def crawls(self, distance: float):
         assert self.is_alive, self.name or self.animal_type + \
             "'s final crawl (to the grave) already completed"
         assert isinstance(distance, (int, float)), 'invalid distance'
         self.travelled(distance)
-        self.add_action(Action.crawled, str(distance) +
-                        ' ' + self.__distance_units__)
+        self.__add_measured_action__(Action.crawled, distance)
         if distance >= self.__crawling_tiredness_distance__:
             self.gets_tired()
         self.prop_callback()
@@ -452,8 +1164,7 @@ class Animal:
         assert self.is_alive, 'the walking dead - not supported'
         assert isinstance(distance, (int, float)), 'invalid distance'
         self.travelled(distance)
-        self.add_action(Action.walked, str(distance) +
-                        ' ' + self.__distance_units__)
+        self.__add_measured_action__(Action.walked, distance)
         if distance >= self.__walking_tiredness_distance__:
             self.gets_tired()
         self.prop_callback()
@@ -462,8 +1173,7 @@ class Animal:
         assert self.is_alive, "the dead can't walk - let alone run"
         assert isinstance(distance, (int, float)), 'invalid distance'
         self.travelled(distance)
-        self.add_action(Action.ran, str(distance) +
-                        ' ' + self.__distance_units__)
+        self.__add_measured_action__(Action.ran, distance)
         if distance >= self.__running_tiredness_distance__:
             self.gets_warm()
             self.sweats()
@@ -516,6 +1226,7 @@ class Animal:
         self.add_action(Action.spoke, words)
         word_count = len(words.split())
         self.__words_spoken_count__ += word_count
+        self.__state_changed__()
         self.prop_callback()
 
     @property
@@ -541,13 +1252,23 @@ class Animal:
         self.__is_sweating__ = False
         self.add_action(Action.cooled)
 
+    # a live set-view - adding/discarding through it adds/removes our emotions
     @property
     def emotions(self) -> Set[Emotion]:
-        return self.__emotions__
+        return EmotionSet(self)
+
+    @property
+    def emotion_mask(self) -> int: return self.__emotions__
 
     def add_emotion(self, emotion: Emotion):
         assert isinstance(emotion, Emotion), 'invalid emotion'
-        self.__emotions__.add(emotion)
+        self.__emotions__ |= EmotionSet.mask_of((emotion,))
+        self.__state_changed__()
+
+    def remove_emotion(self, emotion: Emotion):
+        assert isinstance(emotion, Emotion), 'invalid emotion'
+        self.__emotions__ &= ~EmotionSet.mask_of((emotion,))
+        self.__state_changed__()
 
     @property
     def has_healing_touch(self) -> bool: return self.__has_healing_touch__
@@ -567,85 +1288,89 @@ class Bird(Animal):
     """
     Bird class - for all our feathered friends
     """
+    __has_tail__ = True
+    __has_feathers__ = True
+    __can_lay_eggs__ = True
+    # not all birds can fly
+    __slots__ = ('__can_fly__',)
 
     def __init__(self, can_fly: bool = True, *args, **kwargs):
         assert isinstance(can_fly, bool), 'invalid can-fly value'
         #
         super().__init__(*args, type='Bird', **kwargs)
-        # overrides - bird-specific attributes
-        self.__has_tail__ = True
-        self.__has_feathers__ = True
         self.__can_fly__ = can_fly
-        self.__can_lay_eggs__ = True
 
 
 class Fish(Animal):
     """
     Fish class - for all our swimming, swishy friends
     """
+    __has_scales__ = True
+    __has_tail__ = True
+    __has_gills__ = True
+    __slots__ = ()
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, type='Fish', **kwargs)
-        # overrides - fish-specific attributes
-        self.__has_scales__: bool = True
-        self.__has_tail__ = True
-        self.__has_gills__: bool = True
 
 
 class Mammal(Animal):
     """
     Mammal class - parent class for all mammals
     """
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # overrides - mammal-specific attributes
-        self.__is_mammal__: bool = True
-        self.__type__: str = 'Mammal'
+    __is_mammal__ = True
+    __slots__ = ()
 
 
 class Cat(Mammal):
     """
     Cat class - for all our furry friends
     """
+    __leg_count__ = 4
+    __has_tail__ = True
+    __is_fluffy__ = True
+    __has_paws__ = True
+    __makes_sound__ = 'meow'
+    __has_hair__ = True
+    __slots__ = ()
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, type='Cat', **kwargs)
-        # overrides - cat-specific attributes
-        self.__leg_count__ = 4
-        self.__has_tail__ = True
-        self.__is_fluffy__ = True
-        self.__has_paws__ = True
-        self.__makes_sound__: str = 'meow'
-        self.__has_hair__: bool = True
 
 
 class Dog(Mammal):
     """
     Dog class - for our best friends
     """
+    __leg_count__ = 4
+    __has_tail__ = True
+    __wags_tail__ = True
+    __has_paws__ = True
+    __makes_sound__ = 'woof'
+    __has_hair__ = True
+    __slots__ = ()
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, type='Dog', **kwargs)
-        # overrides - dog-specific attributes
-        self.__leg_count__ = 4
-        self.__has_tail__ = True
-        self.__wags_tail__: bool = True
-        self.__has_paws__: bool = True
-        self.__makes_sound__: str = 'woof'
-        self.__has_hair__: bool = True
 
 
 class Person(Mammal):
     """
     Person class - for us (people)
     """
-    __person_id__: int = 0
+    __makes_sound__ = 'bla bla bla'
+    __leg_count__ = 2
+    __has_hair__ = True
+    __can_change_hair_color__ = True
+    __slots__ = ('__is_criminal__', '__is_forgiven__',
+                 '__person_id__', '__parent_of_families_id__')
+    #
+    __last_person_id__: int = 0
 
     @classmethod
     def next_person_id(cls) -> int:
-        cls.__person_id__ += 1
-        return cls.__person_id__
+        cls.__last_person_id__ += 1
+        return cls.__last_person_id__
 
     def __init__(self, name: str, age: int = None, dob: datetime.datetime = None, *args, **kwargs):
         # person must have a name
@@ -658,17 +1383,13 @@ class Person(Mammal):
         #
         super().__init__(age=age, dob=dob, type='Person', name=name, *args, **kwargs)
         # overrides - human-specific attributes
-        self.__is_wild__: bool = False
-        self.__makes_sound__ = 'bla bla bla'
-        self.__leg_count__ = 2
         self.__is_wild__ = False
         self.__is_criminal__ = False
         self.__is_forgiven__ = False
 
         self.__person_id__ = Person.next_person_id()
-        self.__parent_of_families_id__: Set[int] = set()
-        self.__has_hair__: bool = True
-        self.__can_change_hair_color__: bool = True
+        # a dict (rather than a set) so that we remember the order the families were joined
+        self.__parent_of_families_id__: Dict[int, None] = dict()
         if self.__hair_color__ is None:
             self.__hair_color__ = HairColor.brunette
 
@@ -678,7 +1399,17 @@ class Person(Mammal):
     # the families this person is a parent of
     @property
     def parent_of_families_id(self) -> Set[int]:
-        return self.__parent_of_families_id__
+        return self.__parent_of_families_id__.keys()
+
+    # the family this person is a child of or, failing that, the first family
+    #  they became a parent of
+    @property
+    def home_family_id(self) -> int:
+        if self.family_id is not None:
+            return self.family_id
+        for family_id in self.__parent_of_families_id__:
+            return family_id
+        return None
 
     @property
     def is_criminal(self) -> bool: return self.__is_criminal__
@@ -692,6 +1423,7 @@ class Person(Mammal):
         assert self.is_alive, 'the dead cannot forgive'
         #
         sinner.__is_forgiven__ = True
+        sinner.__state_changed__()
 
     def is_sibling_of(self, other: 'Person') -> bool:
         return other.family_id == self.family_id
@@ -702,13 +1434,12 @@ class Person(Mammal):
     def is_sister_of(self, other: 'Person') -> bool:
         return self.is_sibling_of(other) and self.gender == Gender.female
 
-    def __getstate__(self):
-        state = self.__dict__.copy()
-        if hasattr(self, '__property_updated_callback__'):
-            del state['__property_updated_callback__']
-        if hasattr(self, '__notify_container_callback__'):
-            del state['__notify_container_callback__']
-        return state
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        # older saved worlds stored the parent-of families as a set
+        if isinstance(self.__parent_of_families_id__, set):
+            self.__parent_of_families_id__ = dict.fromkeys(
+                sorted(self.__parent_of_families_id__))
 
 
 class Family:
@@ -732,11 +1463,14 @@ class Family:
         self.__family_id__ = Family.__next_id__()
         # the community ID this person currently belongs to
         self.__community_id__: int = None
+        # ...and the community itself - so it can keep its population counts current
+        self.__community__: 'Community' = None
         #
         self.__family_name__ = name
         self.__parents__: List[Person] = list()
         self.__children__: List[Person] = list()
         self.__pets__: List[Animal] = list()
+        self.__index_members__()
         message(name, 'family created')
         self.__members_updated_callback__ = members_updated_callback
 
@@ -746,9 +1480,56 @@ class Family:
     # the community of which this person is a member
     @property
     def community_id(self) -> int: return self.__community_id__
+    # identity-sets alongside the (ordered) lists, for O(1) membership tests
+    def __index_members__(self):
+        self.__parent_set__: Set[Person] = set(self.__parents__)
+        self.__child_set__: Set[Person] = set(self.__children__)
+        self.__pet_set__: Set[Animal] = set(self.__pets__)
+        self.__members_changed__()
+
+    # drop the cached members/member-ids - only called when parents or children change
+    def __members_changed__(self):
+        self.__members_cache__: Set[Person] = None
+        self.__member_ids_cache__: Set[int] = None
+
+    # keep our community's (and so its world's) population counts current
+    def __member_joined__(self, person: Person):
+        if self.__community__ is not None:
+            self.__community__.__member_joined__(person)
+
+    def __member_left__(self, person: Person):
+        if self.__community__ is not None:
+            self.__community__.__member_left__(person)
+
+    # tell our world (via our community) that we have changed - e.g. for its journal
+    def __changed__(self):
+        if self.__community__ is not None:
+            self.__community__.__family_changed__(self)
+
+    # whether our world is being ingested (see Ingest)
+    def __is_trusted__(self) -> bool:
+        return self.__community__ is not None and Ingest.trusts(self.__community__.__world__)
+
+    # the parents of people have changed - keep our world's family-tree current
+    def __kinship_changed__(self, people: List[Person]):
+        if self.__community__ is not None and self.__community__.__world__ is not None:
+            self.__community__.__world__.__kinship_changed__(people)
+
+    # pets have come (or gone) - so that our world can give them its action retention
+    def __pets_joined__(self, pets: List[Animal]):
+        if self.__community__ is not None and self.__community__.__world__ is not None:
+            self.__community__.__world__.__pets_joined__(pets)
+
+    def __pets_left__(self, pets: List[Animal]):
+        if self.__community__ is not None and self.__community__.__world__ is not None:
+            self.__community__.__world__.__pets_left__(pets)
+
     @property
     def member_ids(self) -> Set[int]:
-        return set([person.id for person in self.members])
+        if self.__member_ids_cache__ is None:
+            self.__member_ids_cache__ = frozenset(
+                [person.id for person in self.members])
+        return self.__member_ids_cache__
 
     @property
     def member_names(self) -> List[str]:
@@ -763,22 +1544,29 @@ class Family:
         assert new_name != '', 'invalid name'
         self.__family_name__ = new_name
         self.notify_container()
+        self.__changed__()
         self.prop_callback()
 
     def prop_callback(self):
         if self.__members_updated_callback__ is not None:
-            self.__members_updated_callback__()
+            Batch.fire(self.__members_updated_callback__)
 
     def set_notify_container(self, callback):
         assert callable(callback), 'callback must be a function/method'
         self.__notify_container_callback__ = callback
 
+    def batch(self) -> Batch:
+        """
+        a context deferring (and de-duplicating) change-callbacks until it closes
+        """
+        return Batch()
+
     def notify_container(self):
         if not hasattr(self, '__notify_container_callback__'):
             return
         if self.__notify_container_callback__ is None:
             return
-        self.__notify_container_callback__()
+        Batch.fire(self.__notify_container_callback__)
 
     @property
     def parents(self) -> List[Person]: return self.__parents__
@@ -788,19 +1576,31 @@ class Family:
     def pets(self) -> List[Animal]: return self.__pets__
 
     @property
-    def members(self) -> List[Person]: return set(self.children + self.parents)
+    def members(self) -> Set[Person]:
+        if self.__members_cache__ is None:
+            self.__members_cache__ = frozenset(
+                self.__child_set__.union(self.__parent_set__))
+        return self.__members_cache__
 
     @property
     def population(self) -> int:
         # note that since a person can be a parent across multiple families,
         #  it's not safe to add the populations of families (you may be double-counting!)
-        return len(self.members)
+        # (no-one can be both a parent and a child of the same family)
+        return len(self.__parent_set__) + len(self.__child_set__)
 
     def set_members_updated_callback(self, callback: callable):
         assert callable(
             callback), 'callback must be a callable function/method'
         self.__members_updated_callback__ = callback
 
+    def actions_between(self, start: float = None, end: float = None):
+        """
+        the (time, person-or-pet, action) of the actions of all our members and pets
+        from start up to (not including) end - in time order
+        """
+        return ActionHistory.merged_between(list(self.members) + self.pets, start, end)
+
     @property
     def alive_parents(self) -> List[Person]:
         return [parent for parent in self.parents if parent.is_alive]
@@ -824,7 +1624,7 @@ class Family:
 
     @property
     def child_ages(self) -> List[int]:
-        return [child.age for child in self.children]
+        return list(Animal.ages_of(self.children))
 
     @property
     def parent_names(self) -> List[str]:
@@ -832,73 +1632,161 @@ class Family:
 
     @property
     def parent_ages(self) -> List[int]:
-        return [parent.age for parent in self.parents]
+        return list(Animal.ages_of(self.parents))
+
+    def ages(self, as_of: datetime.date = None) -> array:
+        """
+        the ages of our parents then our children, all as at as_of (by default, now)
+        """
+        return Animal.ages_of(self.parents + self.children, as_of=as_of)
 
     def has_parent(self, person: Person) -> bool:
         assert isinstance(person, Person), 'invalid person'
-        return person in self.parents
+        return person in self.__parent_set__
 
     def has_child(self, person: Person) -> bool:
         assert isinstance(person, Person), 'invalid person'
-        return person in self.children
+        return person in self.__child_set__
 
     def has_pet(self, pet: Animal) -> bool:
         assert isinstance(pet, Animal), 'invalid animal'
         if pet.is_pet:
-            return pet in self.pets
+            return pet in self.__pet_set__
         return False
 
     def pet_add(self, pet: Animal, name: str = None):
         """
         add a pet to this family
         """
-        assert isinstance(pet, Animal)
-        # cannot add a pet if already a pet
-        assert not self.has_pet(pet), 'already has pet' + \
-            pet.name + ' - cannot add again'
+        if not self.__is_trusted__():
+            assert isinstance(pet, Animal)
+            # cannot add a pet if already a pet
+            assert not self.has_pet(pet), 'already has pet' + \
+                pet.name + ' - cannot add again'
+            #
+            assert not isinstance(pet, Person), pet.name + \
+                ' is a person - cannot be a pet'
+            #
+            assert pet.family_id is None, pet.name + \
+                ' already belongs to a family, cannot add to another'
         #
-        assert not isinstance(pet, Person), pet.name + \
-            ' is a person - cannot be a pet'
-        #
-        assert pet.family_id is None, pet.name + \
-            ' already belongs to a family, cannot add to another'
-        #
-        pet.make_pet(family_id=self.id, name=name)
-        self.pets.append(pet)
+        pet.make_pet(family_id=self.id, name=name, trusted=self.__is_trusted__())
+        # (so that the pet's changes reach our world - pets are not members)
+        pet.__pet_family__ = self
+        self.__pets__.append(pet)
+        self.__pet_set__.add(pet)
+        self.__pets_joined__([pet])
         message(self.name, 'family: added pet', pet.name)
+        self.__changed__()
 
     def pet_remove(self, pet: Animal):
         """
         remove a pet from this family
         """
         assert isinstance(pet, Animal)
-        assert pet in self.pets, 'does not have pet ' + pet.name + ' - cannot remove'
-        self.pets.remove(pet)
+        assert pet in self.__pet_set__, 'does not have pet ' + pet.name + ' - cannot remove'
+        self.__pets__.remove(pet)
+        self.__pet_set__.discard(pet)
+        self.__pets_left__([pet])
         pet.return_to_wild()
         message(self.name, 'family: removed pet', pet.name)
+        self.__changed__()
+
+    def pets_add_many(self, pets: List[Animal]):
+        """
+        add (already named) pets to this family - all checked before any are added
+        """
+        pets = list(pets)
+        if not self.__is_trusted__():
+            for pet in pets:
+                assert isinstance(pet, Animal)
+                assert not isinstance(pet, Person), pet.name + \
+                    ' is a person - cannot be a pet'
+                assert not self.has_pet(pet), 'already has pet' + \
+                    pet.name + ' - cannot add again'
+                assert pet.family_id is None, pet.name + \
+                    ' already belongs to a family, cannot add to another'
+                assert not pet.is_pet, pet.animal_type + ' is already a pet'
+                assert isinstance(pet.name, str) and pet.name != '', 'invalid pet name'
+            assert len(set(pets)) == len(pets), 'the same pet given twice'
+        if not pets:
+            return
+        #
+        trusted = self.__is_trusted__()
+        for pet in pets:
+            pet.make_pet(family_id=self.id, trusted=trusted)
+            pet.__pet_family__ = self
+        self.__pets__.extend(pets)
+        self.__pet_set__.update(pets)
+        self.__pets_joined__(pets)
+        message(self.name, 'family: added', len(pets), 'pets')
+        self.__changed__()
 
     def child_add(self, person: Person):
         """
         add a child to this family
         """
-        assert isinstance(person, Person), 'invalid person'
-        # cannot add as child if already a parent
-        assert not self.has_parent(
-            person), 'already has parent' + person.name + ' - cannot add as a child'
-        # cannot add as child if already a child
-        assert not self.has_child(
-            person), 'already has child' + person.name + ' - cannot add again'
-        # age must be less than parent ages
-        for parent in self.parents:
-            assert person.dob > parent.dob, person.name + \
-                ' is older than (parent)' + parent.name + \
-                ' - cannot be their child'
+        if not self.__is_trusted__():
+            assert isinstance(person, Person), 'invalid person'
+            # cannot add as child if already a parent
+            assert not self.has_parent(
+                person), 'already has parent' + person.name + ' - cannot add as a child'
+            # cannot add as child if already a child
+            assert not self.has_child(
+                person), 'already has child' + person.name + ' - cannot add again'
+            # age must be less than parent ages
+            for parent in self.parents:
+                assert person.dob > parent.dob, person.name + \
+                    ' is older than (parent)' + parent.name + \
+                    ' - cannot be their child'
 
         # now can add as a child
         message(self.name, 'family: added child', person.name)
-        self.children.append(person)
+        self.__children__.append(person)
+        self.__child_set__.add(person)
+        self.__members_changed__()
+        self.__member_joined__(person)
         person.__family_id__ = self.__family_id__
+        self.__kinship_changed__([person])
         person.add_action(Action.child_added_to_family, self.name)
+        self.__changed__()
+        self.prop_callback()
+
+    def children_add_many(self, people: List[Person]):
+        """
+        add children to this family - all checked before any are added, and our
+        callbacks fired once
+        """
+        people = list(people)
+        if not people:
+            return
+        if not self.__is_trusted__():
+            for person in people:
+                assert isinstance(person, Person), 'invalid person'
+                assert not self.has_parent(
+                    person), 'already has parent' + person.name + ' - cannot add as a child'
+                assert not self.has_child(
+                    person), 'already has child' + person.name + ' - cannot add again'
+            assert len(set(people)) == len(people), 'the same child given twice'
+            # every child must be younger than every parent
+            if self.parents:
+                youngest_parent = max(self.parents, key=lambda parent: parent.dob)
+                eldest_child = min(people, key=lambda person: person.dob)
+                assert eldest_child.dob > youngest_parent.dob, eldest_child.name + \
+                    ' is older than (parent)' + youngest_parent.name + \
+                    ' - cannot be their child'
+        #
+        message(self.name, 'family: added', len(people), 'children')
+        self.__children__.extend(people)
+        self.__child_set__.update(people)
+        self.__members_changed__()
+        for person in people:
+            self.__member_joined__(person)
+            person.__family_id__ = self.__family_id__
+        self.__kinship_changed__(people)
+        for person in people:
+            person.add_action(Action.child_added_to_family, self.name)
+        self.__changed__()
         self.prop_callback()
 
     def child_remove(self, person: Person):
@@ -908,39 +1796,90 @@ class Family:
         #
         assert person is not None and isinstance(person, Person)
         #
-        assert person in self.children, person.name + ' is not a child, cannot remove'
-        self.children.remove(person)
+        assert person in self.__child_set__, person.name + ' is not a child, cannot remove'
+        self.__children__.remove(person)
+        self.__child_set__.discard(person)
+        self.__members_changed__()
+        self.__member_left__(person)
         person.__family_id__ = None
+        self.__kinship_changed__([person])
         person.add_action(Action.removed_from_family, self.name)
         print(self.name, 'family: removed child', person.name)
+        self.__changed__()
         self.prop_callback()
 
     def parent_add(self, person: Person):
         """
         add a parent to this family
         """
-        assert person is not None and isinstance(person, Person)
-        # cannot add as parent if already a parent of this family
-        assert not self.has_parent(
-            person), 'already has parent ' + person.name + ' - cannot add again'
-        # cannot add as parent if already a child of this family
-        assert not self.has_child(
-            person), 'already has child ' + person.name + ' - cannot add as a parent'
-        # cannot have more than 2 alive parents
-        assert not len(
-            self.alive_parents) >= 2, '2 alive parents already - cannot add more'
-        # age of parent cannot be less than children
-        for child in self.children:
-            assert person.dob < child.dob, person.name + \
-                ' is younger than (child) ' + child.name + \
-                ' - cannot be their parent'
+        if not self.__is_trusted__():
+            assert person is not None and isinstance(person, Person)
+            # cannot add as parent if already a parent of this family
+            assert not self.has_parent(
+                person), 'already has parent ' + person.name + ' - cannot add again'
+            # cannot add as parent if already a child of this family
+            assert not self.has_child(
+                person), 'already has child ' + person.name + ' - cannot add as a parent'
+            # cannot have more than 2 alive parents
+            assert not len(
+                self.alive_parents) >= 2, '2 alive parents already - cannot add more'
+            # age of parent cannot be less than children
+            for child in self.children:
+                assert person.dob < child.dob, person.name + \
+                    ' is younger than (child) ' + child.name + \
+                    ' - cannot be their parent'
         # no gender-related restrictions on who can be parents(!)
         #
         # now can add the parent
-        self.parents.append(person)
-        person.__parent_of_families_id__.add(self.__family_id__)
+        self.__parents__.append(person)
+        self.__parent_set__.add(person)
+        self.__members_changed__()
+        self.__member_joined__(person)
+        person.__parent_of_families_id__[self.__family_id__] = None
+        self.__kinship_changed__(self.children)
         person.add_action(Action.became_parent, self.name)
         message(self.name, 'family: added parent', person.name)
+        self.__changed__()
+        self.prop_callback()
+
+    def parents_add_many(self, people: List[Person]):
+        """
+        add parents to this family - all checked before any are added, and our
+        callbacks fired once
+        """
+        people = list(people)
+        if not self.__is_trusted__():
+            for person in people:
+                assert isinstance(person, Person), 'invalid person'
+                assert not self.has_parent(
+                    person), 'already has parent ' + person.name + ' - cannot add again'
+                assert not self.has_child(
+                    person), 'already has child ' + person.name + ' - cannot add as a parent'
+            assert len(set(people)) == len(people), 'the same parent given twice'
+        if not people:
+            return
+        if not self.__is_trusted__():
+            assert len(self.alive_parents) + len([person for person in people if person.is_alive]) <= 2, \
+                'would have more than 2 alive parents - cannot add'
+            # every parent must be older than every child
+            if self.children:
+                youngest_parent = max(people, key=lambda person: person.dob)
+                eldest_child = min(self.children, key=lambda child: child.dob)
+                assert youngest_parent.dob < eldest_child.dob, youngest_parent.name + \
+                    ' is younger than (child) ' + eldest_child.name + \
+                    ' - cannot be their parent'
+        #
+        self.__parents__.extend(people)
+        self.__parent_set__.update(people)
+        self.__members_changed__()
+        for person in people:
+            self.__member_joined__(person)
+            person.__parent_of_families_id__[self.__family_id__] = None
+        self.__kinship_changed__(self.children)
+        for person in people:
+            person.add_action(Action.became_parent, self.name)
+        message(self.name, 'family: added', len(people), 'parents')
+        self.__changed__()
         self.prop_callback()
 
     def parent_remove(self, person: Person):
@@ -949,14 +1888,58 @@ class Family:
         """
         #
         assert isinstance(person, Person), 'invalid person'
-        assert person in self.parents, person.name + ' is not a parent, cannot remove'
+        assert person in self.__parent_set__, person.name + ' is not a parent, cannot remove'
         #
-        self.parents.remove(person)
-        person.__parent_of_families_id__.remove(self.__family_id__)
+        self.__parents__.remove(person)
+        self.__parent_set__.discard(person)
+        self.__members_changed__()
+        self.__member_left__(person)
+        del person.__parent_of_families_id__[self.__family_id__]
+        self.__kinship_changed__(self.children)
         person.add_action(Action.removed_as_parent, self.name)
         message(self.name, 'family: removed parent', person.name)
+        self.__changed__()
         self.prop_callback()
 
+    def violations(self) -> List[str]:
+        """
+        what (if anything) is inconsistent about this family - the checks child_add()
+        etc. make, all made at once (e.g. after an ingest)
+        """
+        violations = []
+        prefix = self.name + ' family: '
+        for person in self.parents + self.children:
+            if not isinstance(person, Person):
+                violations.append(prefix + 'invalid person ' + repr(person))
+        for pet in self.pets:
+            if not isinstance(pet, Animal) or isinstance(pet, Person):
+                violations.append(prefix + 'invalid pet ' + repr(pet))
+            elif pet.family_id != self.id or not pet.is_pet:
+                violations.append(prefix + str(pet.name) + ' is not our pet')
+        if violations:
+            return violations
+        for kind, people in (('parent', self.parents), ('child', self.children), ('pet', self.pets)):
+            if len(set(people)) != len(people):
+                violations.append(prefix + 'has a ' + kind + ' more than once')
+        for person in self.__parent_set__ & self.__child_set__:
+            violations.append(prefix + person.name + ' is both a parent and a child')
+        if len(self.alive_parents) > 2:
+            violations.append(prefix + 'more than 2 alive parents')
+        # every child must be younger than every parent
+        if self.parents and self.children:
+            youngest_parent = max(self.parents, key=lambda parent: parent.dob)
+            eldest_child = min(self.children, key=lambda child: child.dob)
+            if eldest_child.dob <= youngest_parent.dob:
+                violations.append(prefix + eldest_child.name + ' is older than (parent) ' +
+                                  youngest_parent.name)
+        for child in self.children:
+            if child.family_id != self.id:
+                violations.append(prefix + child.name + ' does not know they are our child')
+        for parent in self.parents:
+            if self.id not in parent.parent_of_families_id:
+                violations.append(prefix + parent.name + ' does not know they are our parent')
+        return violations
+
     # for pickling
     def __getstate__(self):
         state = self.__dict__.copy()
@@ -964,8 +1947,21 @@ class Family:
             del state['__members_updated_callback__']
         if hasattr(self, '__notify_container_callback__'):
             del state['__notify_container_callback__']
+        # the identity-sets and caches are re-built when un-pickled
+        for key in ('__parent_set__', '__child_set__', '__pet_set__',
+                    '__members_cache__', '__member_ids_cache__', '__community__'):
+            state.pop(key, None)
         return state
 
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__members_updated_callback__ = None
+        # our community re-attaches itself when it is un-pickled
+        self.__community__ = None
+        self.__index_members__()
+        for pet in self.__pets__:
+            pet.__pet_family__ = self
+
 
 class Community:
     """
@@ -987,7 +1983,12 @@ class Community:
         self.__community_id__ = Community.__next_id__()
         self.__community_name__ = name
         self.__world_id__: int = None
+        # the world we belong to (if any) - so it can keep its family-index current
+        self.__world__: 'World' = None
         self.__all_families__: List[Family] = []
+        self.__families_by_id__: Dict[int, Family] = {}
+        # person-id -> how many of our families they are a member of
+        self.__member_counts__: Dict[int, int] = {}
         self.__families_updated_callback__ = families_updated_callback
 
     @property
@@ -1003,22 +2004,29 @@ class Community:
         assert new_name != '', 'invalid name'
         self.__community_name__ = new_name
         self.notify_container()
+        self.__changed__()
         self.prop_callback()
 
     def prop_callback(self):
         if self.__families_updated_callback__ is not None:
-            self.__families_updated_callback__()
+            Batch.fire(self.__families_updated_callback__)
 
     def set_notify_container(self, callback):
         assert callable(callback), 'callback must be a function/method'
         self.__notify_container_callback__ = callback
 
+    def batch(self) -> Batch:
+        """
+        a context deferring (and de-duplicating) change-callbacks until it closes
+        """
+        return Batch()
+
     def notify_container(self):
         if not hasattr(self, '__notify_container_callback__'):
             return
         if self.__notify_container_callback__ is None:
             return
-        self.__notify_container_callback__()
+        Batch.fire(self.__notify_container_callback__)
 
     @property
     def all_families(self) -> List[Family]: return self.__all_families__
@@ -1040,53 +2048,153 @@ class Community:
         self.family_add(fam)
 
     def family_add(self, family: Family):
-        assert isinstance(family, Family), 'invalid family'
-        #
-        # cannot already be in this community
-        assert family.community_id != self.id, 'cannot add ' + \
-            family.name + ' family: already in this community'
-        # cannot belong to another community already
-        assert family.community_id is None, 'cannot add ' + \
-            family.name + ' family: is in another community'
+        if not self.__is_trusted__():
+            assert isinstance(family, Family), 'invalid family'
+            #
+            # cannot already be in this community
+            assert family.community_id != self.id, 'cannot add ' + \
+                family.name + ' family: already in this community'
+            # cannot belong to another community already
+            assert family.community_id is None, 'cannot add ' + \
+                family.name + ' family: is in another community'
         # so we're good to go
         self.all_families.append(family)
+        self.__families_by_id__[family.id] = family
         family.__community_id__ = self.__community_id__
+        family.__community__ = self
+        for person in family.members:
+            self.__member_joined__(person)
+        if self.__world__ is not None:
+            self.__world__.__family_indexed__(family, self)
         message(self.name, 'community: added', family.name, 'family')
+        self.__changed__()
+        self.prop_callback()
+
+    def families_add_many(self, families: List[Family]):
+        """
+        add families to this community - all checked before any are added, and
+        our callbacks fired once
+        """
+        families = list(families)
+        if not self.__is_trusted__():
+            for family in families:
+                assert isinstance(family, Family), 'invalid family'
+                assert family.community_id != self.id, 'cannot add ' + \
+                    family.name + ' family: already in this community'
+                assert family.community_id is None, 'cannot add ' + \
+                    family.name + ' family: is in another community'
+            assert len(set(families)) == len(families), 'the same family given twice'
+        if not families:
+            return
+        #
+        self.all_families.extend(families)
+        for family in families:
+            self.__families_by_id__[family.id] = family
+            family.__community_id__ = self.__community_id__
+            family.__community__ = self
+            for person in family.members:
+                self.__member_joined__(person)
+            if self.__world__ is not None:
+                self.__world__.__family_indexed__(family, self)
+        message(self.name, 'community: added', len(families), 'families')
+        self.__changed__()
         self.prop_callback()
 
     def family_remove(self, family: Family):
         assert isinstance(family, Family), 'invalid family'
         #
-        assert family in self.all_families, 'cannot remove ' + \
+        assert self.__families_by_id__.get(family.id) is family, 'cannot remove ' + \
             family.name + ' family: not in this community'
         self.all_families.remove(family)
+        del self.__families_by_id__[family.id]
         family.__community_id__ = None
+        family.__community__ = None
+        for person in family.members:
+            self.__member_left__(person)
+        if self.__world__ is not None:
+            self.__world__.__family_unindexed__(family)
         message(self.name, 'community: removed', family.name, 'family')
+        self.__changed__()
         self.prop_callback()
 
+    # only to be called by our families - a person counts once, however many
+    #  of our families they are a member of
+    def __member_joined__(self, person: Person):
+        count = self.__member_counts__.get(person.id, 0)
+        self.__member_counts__[person.id] = count + 1
+        if count == 0 and self.__world__ is not None:
+            self.__world__.__member_joined__(person)
+
+    def __member_left__(self, person: Person):
+        count = self.__member_counts__[person.id] - 1
+        if count > 0:
+            self.__member_counts__[person.id] = count
+            return
+        del self.__member_counts__[person.id]
+        if self.__world__ is not None:
+            self.__world__.__member_left__(person)
+
+    # only to be called by our families
+    def __family_changed__(self, family: Family):
+        if self.__world__ is not None:
+            self.__world__.__family_changed__(family)
+
+    # tell our world that we have changed - e.g. for its journal
+    def __changed__(self):
+        if self.__world__ is not None:
+            self.__world__.__community_changed__(self)
+
+    # whether our world is being ingested (see Ingest)
+    def __is_trusted__(self) -> bool:
+        return Ingest.trusts(self.__world__)
+
     @property
-    def population(self) -> int:
-        ids = set()
+    def members(self) -> List[Person]:
+        members = dict()
         for family in self.all_families:
-            ids = ids.union(family.member_ids)
-        return len(ids)
+            for person in family.members:
+                members[person.id] = person
+        return list(members.values())
+
+    @property
+    def population(self) -> int:
+        return len(self.__member_counts__)
+
+    def has_member(self, person: Person) -> bool:
+        assert isinstance(person, Person), 'invalid person'
+        return person.id in self.__member_counts__
+
+    @property
+    def pets(self) -> List[Animal]:
+        return [pet for family in self.all_families for pet in family.pets]
+
+    def actions_between(self, start: float = None, end: float = None):
+        """
+        the (time, person-or-pet, action) of the actions of all the members and pets
+        of our families from start up to (not including) end - in time order
+        """
+        return ActionHistory.merged_between(self.members + self.pets, start, end)
+
+    def family_by_id(self, family_id: int) -> Family:
+        assert isinstance(family_id, int), 'invalid family ID'
+        return self.__families_by_id__.get(family_id)
 
     def family_of(self, person_or_pet) -> Family:
         assert isinstance(person_or_pet, Animal), 'invalid person or animal'
-        family_id = None
+        family = None
         if not isinstance(person_or_pet, Person):
-            family_id = person_or_pet.family_id
-        elif isinstance(person_or_pet, Person):
-            family_id = person_or_pet.family_id
-            if family_id is None:
-                # or maybe they're a parent in a family?
-                family_ids = person_or_pet.parent_of_families_id
-                if len(family_ids) > 0:
-                    # just pick any family they're a parent of...
-                    family_id = next(iter(family_ids))
-        families = [fam for fam in self.all_families if fam.id == family_id]
-        assert len(families) > 0, person_or_pet.name + ' has no family'
-        return families[0]
+            family = self.__families_by_id__.get(person_or_pet.family_id)
+        else:
+            family = self.__families_by_id__.get(person_or_pet.home_family_id)
+            if family is None:
+                # or maybe they're a parent of a (different) family in this community?
+                for family_id in person_or_pet.parent_of_families_id:
+                    family = self.__families_by_id__.get(family_id)
+                    if family is not None:
+                        break
+        assert family is not None, (person_or_pet.name or person_or_pet.animal_type) + \
+            ' has no family'
+        return family
 
     def surname_of(self, person: Person) -> str:
         assert isinstance(person, Person), 'invalid person'
@@ -1153,7 +2261,7 @@ class Community:
         assert family is not None, person.name + ' has no siblings'
         # so we have a family - but we could be either a child or parent
         # ensure we're a child-only
-        assert person in family.children, person.name + ' is not a child here'
+        assert family.has_child(person), person.name + ' is not a child here'
         return [sibling for sibling in family.children if sibling is not person]
 
     def sibling_add(self, person: Person, sibling: Person):
@@ -1209,6 +2317,23 @@ class Community:
         assert family is not None, person.name + 'cannot find pets - no family'
         return family.pets
 
+    def violations(self) -> List[str]:
+        """
+        what (if anything) is inconsistent about this community and its families
+        """
+        violations = []
+        if len(set(self.all_families)) != len(self.all_families):
+            violations.append(self.name + ' community: has a family more than once')
+        for family in self.all_families:
+            if not isinstance(family, Family):
+                violations.append(self.name + ' community: invalid family ' + repr(family))
+                continue
+            if family.community_id != self.id or family.__community__ is not self:
+                violations.append(self.name + ' community: ' + family.name +
+                                  ' family does not know it is in this community')
+            violations.extend(family.violations())
+        return violations
+
     # for pickling
     def __getstate__(self):
         state = self.__dict__.copy()
@@ -1216,8 +2341,1750 @@ class Community:
             del state['__families_updated_callback__']
         if hasattr(self, '__notify_container_callback__'):
             del state['__notify_container_callback__']
+        # the world re-attaches itself when it is un-pickled
+        state.pop('__world__', None)
+        state.pop('__families_by_id__', None)
+        state.pop('__member_counts__', None)
         return state
 
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__world__ = None
+        self.__families_by_id__ = {
+            family.id: family for family in self.all_families}
+        self.__member_counts__ = {}
+        for family in self.all_families:
+            family.__community__ = self
+            for person in family.members:
+                self.__member_joined__(person)
+        if not hasattr(self, '__families_updated_callback__'):
+            self.__families_updated_callback__ = None
+
+
+class PopulationStore:
+    """
+    PopulationStore class - a struct-of-arrays mirror of the scalar state of a
+    world's members (one array per attribute, one row per person), so that world-wide
+    filters and aggregates run over flat arrays rather than over Person objects
+
+    Rows are kept dense - removing a person moves the last row into their place.
+    """
+    # column-name -> array type-code
+    __column_types__: Dict[str, str] = {
+        'person_id': 'q',
+        'is_alive': 'b',
+        'gender': 'b',
+        'hair_color': 'b',
+        'distance_travelled': 'd',
+        'words_spoken_count': 'q',
+        'dob': 'l',
+        'emotions': 'l',
+    }
+    # enum-valued columns hold the index of the member in its enum (-1 if none)
+    __enums__: Dict[str, Enum] = {'gender': Gender, 'hair_color': HairColor}
+    __enum_codes__: Dict[Enum, int] = {
+        member: code for enum in (Gender, HairColor) for code, member in enumerate(enum)}
+
+    def __init__(self, people=()):
+        self.__columns__: Dict[str, array] = {
+            name: array(type_code) for name, type_code in PopulationStore.__column_types__.items()}
+        # person-id -> row
+        self.__rows__: Dict[int, int] = {}
+        for person in people:
+            self.add(person)
+
+    def __len__(self) -> int:
+        return len(self.__rows__)
+
+    def __contains__(self, person: 'Person') -> bool:
+        return person.id in self.__rows__
+
+    @staticmethod
+    def __row_values__(person: 'Person') -> tuple:
+        return (person.id,
+                1 if person.is_alive else 0,
+                PopulationStore.__enum_codes__.get(person.gender, -1),
+                PopulationStore.__enum_codes__.get(person.hair_color, -1),
+                person.distance_travelled,
+                person.words_spoken_count,
+                Animal.__date_key__(person.dob),
+                person.emotion_mask)
+
+    def add(self, person: 'Person'):
+        assert person.id not in self.__rows__, person.name + ' is already stored'
+        self.__rows__[person.id] = len(self.__rows__)
+        for column, value in zip(self.__columns__.values(), PopulationStore.__row_values__(person)):
+            column.append(value)
+
+    def update(self, person: 'Person'):
+        row = self.__rows__[person.id]
+        for column, value in zip(self.__columns__.values(), PopulationStore.__row_values__(person)):
+            column[row] = value
+
+    def remove(self, person: 'Person'):
+        row = self.__rows__.pop(person.id)
+        last = len(self.__rows__)
+        for column in self.__columns__.values():
+            if row != last:
+                column[row] = column[last]
+            column.pop()
+        if row != last:
+            self.__rows__[self.__columns__['person_id'][row]] = row
+
+    @property
+    def column_names(self) -> List[str]:
+        return list(self.__columns__)
+
+    def column(self, name: str) -> array:
+        """
+        the (live) array holding column name - one entry per row, not to be modified
+        """
+        assert name in self.__columns__, 'invalid column ' + str(name)
+        return self.__columns__[name]
+
+    def mask(self, is_alive: bool = None, gender: Gender = None,
+             hair_color: HairColor = None, feeling=None) -> bytes:
+        """
+        one byte (1 or 0) per row - whether that row matches all the given criteria
+        (feeling being emotions that must all be felt)
+        """
+        mask = None
+        if feeling is not None:
+            wanted = EmotionSet.mask_of(feeling)
+            mask = bytes([emotions & wanted == wanted
+                          for emotions in self.__columns__['emotions']])
+        criteria = (('is_alive', None if is_alive is None else int(is_alive)),
+                    ('gender', None if gender is None else PopulationStore.__enum_codes__[gender]),
+                    ('hair_color', None if hair_color is None else PopulationStore.__enum_codes__[hair_color]))
+        for name, code in criteria:
+            if code is None:
+                continue
+            matches = bytes(map(code.__eq__, self.__columns__[name]))
+            mask = matches if mask is None else bytes(
+                map(operator.and_, mask, matches))
+        if mask is None:
+            mask = b'\x01' * len(self)
+        return mask
+
+    def __selected__(self, name: str, mask: bytes):
+        assert name in self.__columns__, 'invalid column ' + str(name)
+        return itertools.compress(self.__columns__[name], mask)
+
+    def person_ids(self, **criteria) -> List[int]:
+        return list(self.__selected__('person_id', self.mask(**criteria)))
+
+    def count(self, **criteria) -> int:
+        return sum(self.mask(**criteria))
+
+    def sum(self, name: str, **criteria):
+        return sum(self.__selected__(name, self.mask(**criteria)))
+
+    def mean(self, name: str, **criteria) -> float:
+        mask = self.mask(**criteria)
+        count = sum(mask)
+        if count == 0:
+            return None
+        return sum(self.__selected__(name, mask)) / count
+
+    def counts_by(self, name: str, **criteria) -> Dict:
+        """
+        how many (matching) rows there are for each value of column name
+        """
+        counts: Dict = {}
+        for value in self.__selected__(name, self.mask(**criteria)):
+            counts[value] = counts.get(value, 0) + 1
+        enum = PopulationStore.__enums__.get(name)
+        if enum is None:
+            return counts
+        members = list(enum)
+        return {(members[code] if code >= 0 else None): count for code, count in counts.items()}
+
+
+class FlagBitmaps:
+    """
+    FlagBitmaps class - one bitmap per boolean state-flag of a world's members (bit n
+    being person-id n), so compound questions like "ill AND NOT injured AND alive" are
+    answered with bitwise operations rather than by visiting every person
+    """
+    __flag_names__: List[str] = ['is_alive', 'is_wet', 'is_tired', 'is_ill', 'is_injured',
+                                 'is_sweating', 'is_cold', 'is_clean', 'is_criminal',
+                                 'is_forgiven']
+
+    def __init__(self, people=()):
+        # who is in the bitmaps at all - so that NOT-flags are limited to members
+        self.__members__ = bytearray()
+        self.__bitmaps__: Dict[str, bytearray] = {
+            flag: bytearray() for flag in FlagBitmaps.__flag_names__}
+        for person in people:
+            self.update(person)
+
+    @staticmethod
+    def __set_bit__(bitmap: bytearray, bit: int, value: bool):
+        byte = bit >> 3
+        if byte >= len(bitmap):
+            if not value:
+                return
+            bitmap.extend(bytes(byte + 1 - len(bitmap)))
+        if value:
+            bitmap[byte] |= 1 << (bit & 7)
+        else:
+            bitmap[byte] &= ~(1 << (bit & 7)) & 0xff
+
+    @property
+    def flags(self) -> List[str]:
+        return list(FlagBitmaps.__flag_names__)
+
+    def update(self, person: 'Person'):
+        FlagBitmaps.__set_bit__(self.__members__, person.id, True)
+        for flag, bitmap in self.__bitmaps__.items():
+            FlagBitmaps.__set_bit__(bitmap, person.id, getattr(person, flag))
+
+    def remove(self, person: 'Person'):
+        FlagBitmaps.__set_bit__(self.__members__, person.id, False)
+        for bitmap in self.__bitmaps__.values():
+            FlagBitmaps.__set_bit__(bitmap, person.id, False)
+
+    def bitmap(self, **flags) -> int:
+        """
+        the (int) bitmap of the members matching all the flags - e.g.
+        bitmap(is_ill=True, is_injured=False)
+        """
+        result = int.from_bytes(self.__members__, 'little')
+        for flag, wanted in flags.items():
+            assert flag in self.__bitmaps__, 'invalid flag ' + str(flag)
+            bits = int.from_bytes(self.__bitmaps__[flag], 'little')
+            result = result & bits if wanted else result & ~bits
+        return result
+
+    def count(self, **flags) -> int:
+        return self.bitmap(**flags).bit_count()
+
+    def person_ids(self, **flags) -> List[int]:
+        bitmap = self.bitmap(**flags)
+        ids = []
+        for byte_index, byte in enumerate(bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')):
+            while byte:
+                low_bit = byte & -byte
+                ids.append(byte_index * 8 + low_bit.bit_length() - 1)
+                byte ^= low_bit
+        return ids
+
+
+class SortedPairs:
+    """
+    SortedPairs class - a sorted list of (value, person-id) pairs, for range look-ups
+
+    Pairs added and removed are only merged in when the list is next used - all at
+    once - so that e.g. a member walking (again and again) costs O(1), not O(n)
+    """
+
+    def __init__(self, pairs=()):
+        self.__sorted__: List[tuple] = sorted(pairs)
+        # added (or removed) since the list was last merged
+        self.__added__: Set[tuple] = set()
+        self.__removed__: Set[tuple] = set()
+
+    def add(self, pair: tuple):
+        if pair in self.__removed__:
+            self.__removed__.discard(pair)
+        else:
+            self.__added__.add(pair)
+
+    def remove(self, pair: tuple):
+        if pair in self.__added__:
+            self.__added__.discard(pair)
+        else:
+            self.__removed__.add(pair)
+
+    @property
+    def pairs(self) -> List[tuple]:
+        if self.__removed__:
+            removed = self.__removed__
+            self.__sorted__ = [pair for pair in self.__sorted__ if pair not in removed]
+            self.__removed__ = set()
+        if self.__added__:
+            # (two sorted runs - merged in linear time)
+            self.__sorted__ += sorted(self.__added__)
+            self.__sorted__.sort()
+            self.__added__ = set()
+        return self.__sorted__
+
+
+class AttributeIndexes:
+    """
+    AttributeIndexes class - secondary indexes over a world's members, for World.query:
+    hash-indexes (value -> person-ids) for gender, hair color and alive-state, and
+    sorted indexes of date-of-birth and of distance travelled, for range look-ups
+    """
+    __hashed__: List[str] = ['gender', 'hair_color', 'is_alive']
+
+    def __init__(self, people=()):
+        # attribute -> value -> the ids of the people with that value
+        self.__hashes__: Dict[str, Dict] = {
+            name: dict() for name in AttributeIndexes.__hashed__}
+        # person-id -> the values we last indexed them by
+        self.__indexed__: Dict[int, tuple] = {}
+        for person in people:
+            self.__index_hashes__(person)
+        # sorted (dob-key, person-id) and (distance, person-id) pairs
+        self.__dobs__ = SortedPairs(
+            (values[3], person_id) for person_id, values in self.__indexed__.items())
+        self.__distances__ = SortedPairs(
+            (values[4], person_id) for person_id, values in self.__indexed__.items())
+
+    @staticmethod
+    def __values_of__(person: 'Person') -> tuple:
+        return (person.gender, person.hair_color, person.is_alive,
+                Animal.__date_key__(person.dob), person.distance_travelled)
+
+    # (the hash-indexes only)
+    def __index_hashes__(self, person: 'Person') -> tuple:
+        values = AttributeIndexes.__values_of__(person)
+        self.__indexed__[person.id] = values
+        for name, value in zip(AttributeIndexes.__hashed__, values):
+            self.__hashes__[name].setdefault(value, set()).add(person.id)
+        return values
+
+    def add(self, person: 'Person'):
+        values = self.__index_hashes__(person)
+        self.__dobs__.add((values[3], person.id))
+        self.__distances__.add((values[4], person.id))
+
+    def remove(self, person: 'Person'):
+        values = self.__indexed__.pop(person.id)
+        for name, value in zip(AttributeIndexes.__hashed__, values):
+            self.__hashes__[name][value].discard(person.id)
+        self.__dobs__.remove((values[3], person.id))
+        self.__distances__.remove((values[4], person.id))
+
+    def update(self, person: 'Person'):
+        old_values = self.__indexed__[person.id]
+        values = AttributeIndexes.__values_of__(person)
+        if values == old_values:
+            return
+        self.__indexed__[person.id] = values
+        for name, old_value, value in zip(AttributeIndexes.__hashed__, old_values, values):
+            if value != old_value:
+                self.__hashes__[name][old_value].discard(person.id)
+                self.__hashes__[name].setdefault(value, set()).add(person.id)
+        if values[3] != old_values[3]:
+            self.__dobs__.remove((old_values[3], person.id))
+            self.__dobs__.add((values[3], person.id))
+        if values[4] != old_values[4]:
+            self.__distances__.remove((old_values[4], person.id))
+            self.__distances__.add((values[4], person.id))
+
+    def ids_with(self, name: str, value) -> Set[int]:
+        assert name in self.__hashes__, 'invalid indexed attribute ' + str(name)
+        return self.__hashes__[name].get(value, set())
+
+    # the (start, stop) positions of the pairs with low <= value <= high
+    @staticmethod
+    def __range__(pairs: List[tuple], low, high) -> tuple:
+        start = 0 if low is None else bisect.bisect_left(pairs, (low,))
+        stop = len(pairs) if high is None else bisect.bisect_left(
+            pairs, (high, float('inf')))
+        return start, max(start, stop)
+
+    def dob_range(self, low_key: int = None, high_key: int = None) -> tuple:
+        return AttributeIndexes.__range__(self.__dobs__.pairs, low_key, high_key)
+
+    def distance_range(self, low: float = None, high: float = None) -> tuple:
+        return AttributeIndexes.__range__(self.__distances__.pairs, low, high)
+
+    def dob_ids(self, start: int, stop: int) -> List[int]:
+        return [person_id for _, person_id in self.__dobs__.pairs[start:stop]]
+
+    def distance_ids(self, start: int, stop: int) -> List[int]:
+        return [person_id for _, person_id in self.__distances__.pairs[start:stop]]
+
+
+class NameIndex:
+    """
+    NameIndex class - a world's members sorted by (case-folded) name, for prefix search
+
+    Those added are only sorted in when next needed - all at once - so that adding
+    many people (e.g. a bulk load) is not quadratic
+    """
+
+    def __init__(self, people=()):
+        # person-id -> their name as indexed
+        self.__names__: Dict[int, str] = {
+            person.id: person.name.casefold() for person in people}
+        # sorted (case-folded name, person-id) pairs
+        self.__sorted__: List[tuple] = sorted(
+            (name, person_id) for person_id, name in self.__names__.items())
+        # (case-folded name, person-id) pairs added, but not yet sorted in
+        self.__added__: List[tuple] = []
+
+    def add(self, person: 'Person'):
+        name = person.name.casefold()
+        self.__names__[person.id] = name
+        self.__added__.append((name, person.id))
+
+    def __sort_in__(self):
+        if self.__added__:
+            self.__added__.sort()
+            # (two sorted runs - merged in linear time)
+            self.__sorted__ += self.__added__
+            self.__sorted__.sort()
+            self.__added__ = []
+
+    def remove(self, person: 'Person'):
+        self.__sort_in__()
+        name = self.__names__.pop(person.id)
+        del self.__sorted__[bisect.bisect_left(self.__sorted__, (name, person.id))]
+
+    def update(self, person: 'Person'):
+        if self.__names__[person.id] != person.name.casefold():
+            self.remove(person)
+            self.add(person)
+
+    def ids_starting(self, prefix: str, limit: int = None) -> List[int]:
+        self.__sort_in__()
+        prefix = prefix.casefold()
+        start = bisect.bisect_left(self.__sorted__, (prefix,))
+        stop = bisect.bisect_left(self.__sorted__, (prefix + chr(0x10ffff),))
+        if limit is not None:
+            stop = min(stop, start + limit)
+        return [person_id for _, person_id in self.__sorted__[start:stop]]
+
+
+class Kinship:
+    """
+    Kinship class - the family-tree of a world's members, built from its families'
+    parents and children: each person's ancestors (with how many generations back
+    they are) and generation are worked out once, and only re-worked for those
+    below a change in the tree
+    """
+    # the (male, female, other) words for a relation
+    __words__: Dict[str, tuple] = {
+        'parent': ('father', 'mother', 'parent'),
+        'child': ('son', 'daughter', 'child'),
+        'sibling': ('brother', 'sister', 'sibling'),
+        'pibling': ('uncle', 'aunt', 'aunt/uncle'),
+        'nibling': ('nephew', 'niece', 'niece/nephew'),
+    }
+    __ordinals__: List[str] = ['first', 'second', 'third', 'fourth', 'fifth',
+                               'sixth', 'seventh', 'eighth', 'ninth', 'tenth']
+
+    def __init__(self, world: 'World'):
+        self.__world__: 'World' = world
+        # person-id -> (generation, {ancestor-id: generations back})
+        self.__ancestry__: Dict[int, tuple] = {}
+        for person in world.members:
+            self.__ancestry_of__(person)
+
+    def parents_of(self, person: Person) -> List[Person]:
+        if person.family_id is None:
+            return []
+        family = self.__world__.family_by_id(person.family_id)
+        return [] if family is None else family.parents
+
+    def children_of(self, person: Person) -> List[Person]:
+        children = []
+        for family_id in person.parent_of_families_id:
+            family = self.__world__.family_by_id(family_id)
+            if family is not None:
+                children.extend(family.children)
+        return children
+
+    # (generation, {ancestor-id: generations back}) - working out (without
+    #  recursion) any of the ancestors' that are not yet known first
+    def __ancestry_of__(self, person: Person) -> tuple:
+        ancestry = self.__ancestry__.get(person.id)
+        if ancestry is not None:
+            return ancestry
+        pending = [person]
+        while pending:
+            current = pending[-1]
+            if current.id in self.__ancestry__:
+                pending.pop()
+                continue
+            parents = self.parents_of(current)
+            unknown = [parent for parent in parents
+                       if parent.id not in self.__ancestry__]
+            if unknown:
+                pending.extend(unknown)
+                continue
+            pending.pop()
+            generation = 0
+            ancestors: Dict[int, int] = {}
+            for parent in parents:
+                parent_generation, parent_ancestors = self.__ancestry__[parent.id]
+                generation = max(generation, parent_generation + 1)
+                ancestors[parent.id] = 1
+                for ancestor_id, back in parent_ancestors.items():
+                    if back + 1 < ancestors.get(ancestor_id, back + 2):
+                        ancestors[ancestor_id] = back + 1
+            self.__ancestry__[current.id] = (generation, ancestors)
+        return self.__ancestry__[person.id]
+
+    # only to be called by our world - when the parents of people change; they
+    #  (and all below them) are worked out again when next needed
+    def invalidate(self, people):
+        pending = list(people)
+        while pending:
+            person = pending.pop()
+            if self.__ancestry__.pop(person.id, None) is not None:
+                pending.extend(self.children_of(person))
+
+    def __member__(self, person: Person) -> Person:
+        assert isinstance(person, Person), 'invalid person'
+        assert self.__world__.__members_by_id__.get(person.id) is person, \
+            person.name + ' is not a member of ' + self.__world__.name
+        return person
+
+    def generation_of(self, person: Person) -> int:
+        """
+        how many generations of known ancestors person has above them
+        """
+        return self.__ancestry_of__(self.__member__(person))[0]
+
+    def ancestors_of(self, person: Person) -> Dict[Person, int]:
+        """
+        person's ancestors - and how many generations back each is, nearest first
+        """
+        ancestors = self.__ancestry_of__(self.__member__(person))[1]
+        return {self.__world__.__members_by_id__.get(ancestor_id): back
+                for ancestor_id, back in sorted(ancestors.items(), key=operator.itemgetter(1))}
+
+    def descendants_of(self, person: Person) -> Dict[Person, int]:
+        """
+        person's descendants - and how many generations down each is, nearest first
+        """
+        descendants: Dict[Person, int] = {}
+        generation = self.children_of(self.__member__(person))
+        down = 1
+        while generation:
+            next_generation = []
+            for descendant in generation:
+                if descendant not in descendants:
+                    descendants[descendant] = down
+                    next_generation.extend(self.children_of(descendant))
+            generation = next_generation
+            down += 1
+        return descendants
+
+    def is_ancestor_of(self, ancestor: Person, person: Person) -> bool:
+        return self.__member__(ancestor).id in self.__ancestry_of__(self.__member__(person))[1]
+
+    # the (generations back from a, generations back from b, ancestor-id) of
+    #  the common ancestors of a and b - counting each as their own ancestor
+    def __common__(self, a: Person, b: Person) -> List[tuple]:
+        a_ancestors = dict(self.__ancestry_of__(self.__member__(a))[1])
+        a_ancestors[a.id] = 0
+        b_ancestors = dict(self.__ancestry_of__(self.__member__(b))[1])
+        b_ancestors[b.id] = 0
+        if len(b_ancestors) < len(a_ancestors):
+            return [(a_ancestors[ancestor_id], back, ancestor_id)
+                    for ancestor_id, back in b_ancestors.items() if ancestor_id in a_ancestors]
+        return [(back, b_ancestors[ancestor_id], ancestor_id)
+                for ancestor_id, back in a_ancestors.items() if ancestor_id in b_ancestors]
+
+    def common_ancestors(self, a: Person, b: Person) -> List[Person]:
+        return [self.__world__.__members_by_id__.get(ancestor_id)
+                for _, _, ancestor_id in sorted(self.__common__(a, b))]
+
+    def lowest_common_ancestors(self, a: Person, b: Person) -> List[Person]:
+        """
+        the nearest ancestors a and b have in common (e.g. both parents, for siblings)
+        """
+        common = self.__common__(a, b)
+        if not common:
+            return []
+        nearest = min(a_back + b_back for a_back, b_back, _ in common)
+        return [self.__world__.__members_by_id__.get(ancestor_id)
+                for a_back, b_back, ancestor_id in sorted(common) if a_back + b_back == nearest]
+
+    def relationship(self, a: Person, b: Person) -> str:
+        """
+        what b is to a - e.g. 'mother', 'great-grandson', 'second cousin once removed' -
+        or None if they have no ancestors in common
+        """
+        common = self.__common__(a, b)
+        if not common:
+            return None
+        a_back, b_back, _ = min(common, key=lambda c: (c[0] + c[1], c[0]))
+        if a_back == 0 and b_back == 0:
+            return 'self'
+        if b_back == 0:
+            return Kinship.__lineal__(self.__word__('parent', b), a_back)
+        if a_back == 0:
+            return Kinship.__lineal__(self.__word__('child', b), b_back)
+        if a_back == 1 and b_back == 1:
+            return self.__word__('sibling', b)
+        if b_back == 1:
+            return 'great-' * (a_back - 2) + self.__word__('pibling', b)
+        if a_back == 1:
+            return 'great-' * (b_back - 2) + self.__word__('nibling', b)
+        degree = min(a_back, b_back) - 1
+        removed = abs(a_back - b_back)
+        name = (Kinship.__ordinals__[degree - 1] if degree <= len(Kinship.__ordinals__)
+                else str(degree) + 'th') + ' cousin'
+        if removed == 1:
+            name += ' once removed'
+        elif removed == 2:
+            name += ' twice removed'
+        elif removed > 2:
+            name += ' ' + str(removed) + ' times removed'
+        return name
+
+    def cousins_of(self, person: Person, degree: int = 1) -> List[Person]:
+        """
+        person's cousins of the given degree (1 - first cousins, 2 - second...)
+        """
+        assert isinstance(degree, int) and degree > 0, 'invalid cousin degree'
+        back = degree + 1
+        ancestors = self.__ancestry_of__(self.__member__(person))[1]
+        cousins: Dict[Person, None] = {}
+        for ancestor_id, ancestor_back in ancestors.items():
+            if ancestor_back != back:
+                continue
+            ancestor = self.__world__.__members_by_id__.get(ancestor_id)
+            for descendant, down in self.descendants_of(ancestor).items():
+                if down == back and descendant is not person and \
+                        min(a_back for a_back, _, _ in self.__common__(person, descendant)) == back:
+                    cousins[descendant] = None
+        return list(cousins)
+
+    def __word__(self, relation: str, person: Person) -> str:
+        male, female, other = Kinship.__words__[relation]
+        if person.gender == Gender.male:
+            return male
+        if person.gender == Gender.female:
+            return female
+        return other
+
+    @staticmethod
+    def __lineal__(word: str, back: int) -> str:
+        if back == 1:
+            return word
+        return 'great-' * (back - 2) + 'grand' + word
+
+
+class Journal:
+    """
+    Journal class - keeps a world's saved state current by appending just what has
+    changed to a log (filename + '.journal') alongside a base snapshot (filename,
+    as written by World.store_to_file), rather than re-writing the whole world
+
+    Each save() appends one frame - the (latest) state of each person, family and
+    community changed since the last save, the actions since then, and the world's
+    own record - as a length-prefixed pickle, so a frame torn by a crash is simply
+    ignored when the journal is replayed (see World.load_from_journal).
+
+    Once the log has grown past compact_size bytes, it is folded into a new base
+    snapshot in the background (by a separate process, working only on the files).
+    """
+    __suffix__: str = '.journal'
+    __length_bytes__: int = 8
+
+    def __init__(self, world: 'World', filename: str, compact_size: int = 4 * 1024 * 1024):
+        assert isinstance(filename, str) and filename.strip() != '', 'invalid file name'
+        assert isinstance(compact_size, int) and compact_size > 0, 'invalid compact size'
+        self.__world__: 'World' = world
+        self.__filename__: str = filename.strip()
+        self.__compact_size__: int = compact_size
+        # what has changed since the last save - id -> object
+        self.__people__: Dict[int, Person] = {}
+        self.__families__: Dict[int, Family] = {}
+        self.__communities__: Dict[int, Community] = {}
+        # person-id -> how many of their actions are saved
+        self.__saved_actions__: Dict[int, int] = {
+            person.id: len(person.all_actions) for person in world.members}
+        # held while the log is appended to, or swapped for a compacted one
+        self.__lock__ = threading.Lock()
+        self.__compactor__: threading.Thread = None
+        # start from a fresh base snapshot, and an empty log
+        world.store_to_file(self.__filename__)
+        with open(self.journal_filename, 'wb'):
+            pass
+
+    @property
+    def filename(self) -> str: return self.__filename__
+    @property
+    def journal_filename(self) -> str: return self.__filename__ + Journal.__suffix__
+    @property
+    def is_compacting(self) -> bool:
+        return self.__compactor__ is not None and self.__compactor__.is_alive()
+
+    # only to be called by our world - as its members, families and communities change
+    def __person_changed__(self, person: Person):
+        self.__people__[person.id] = person
+
+    def __person_joined__(self, person: Person):
+        # (they may have been left out of a compacted snapshot while away)
+        self.__saved_actions__[person.id] = 0
+        self.__people__[person.id] = person
+
+    def __family_changed__(self, family: Family):
+        self.__families__[family.id] = family
+
+    def __community_changed__(self, community: Community):
+        self.__communities__[community.id] = community
+
+    def save(self) -> int:
+        """
+        append what has changed since the last save to the log - returning the
+        number of bytes written
+        """
+        world = self.__world__
+        people = []
+        actions = []
+        for person in self.__people__.values():
+            state = person.__getstate__()
+            del state['__action_history__']
+            people.append((person.id, state))
+            saved = self.__saved_actions__.get(person.id, 0)
+            if len(person.all_actions) > saved:
+                actions.append((person.id, saved, person.all_actions.entries_since(saved)))
+                self.__saved_actions__[person.id] = len(person.all_actions)
+        frame = {
+            'counters': World.__id_counters__(),
+            'world': (world.name, [community.id for community in world.all_communities]),
+            'communities': [(community.id, community.name,
+                             [family.id for family in community.all_families])
+                            for community in self.__communities__.values()],
+            'families': [(family.id, family.name, family.community_id,
+                          [parent.id for parent in family.parents],
+                          [child.id for child in family.children], family.pets)
+                         for family in self.__families__.values()],
+            'people': people,
+            'actions': actions,
+        }
+        payload = pickle.dumps(frame)
+        with self.__lock__:
+            with open(self.journal_filename, 'ab') as journal_file:
+                journal_file.write(len(payload).to_bytes(
+                    Journal.__length_bytes__, 'little') + payload)
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+            journal_size = os.path.getsize(self.journal_filename)
+        self.__people__.clear()
+        self.__families__.clear()
+        self.__communities__.clear()
+        if journal_size >= self.__compact_size__ and not self.is_compacting:
+            self.compact()
+        return Journal.__length_bytes__ + len(payload)
+
+    def compact(self, wait: bool = False):
+        """
+        fold the log (as it is now) into a new base snapshot - in the background
+        unless wait
+        """
+        if self.is_compacting:
+            self.__compactor__.join()
+        self.__compactor__ = threading.Thread(target=self.__compact__, daemon=True)
+        self.__compactor__.start()
+        if wait:
+            self.__compactor__.join()
+
+    def __compact__(self):
+        with self.__lock__:
+            end = os.path.getsize(self.journal_filename)
+        compacted = self.__filename__ + '.compacted'
+        # (spawned, not forked - we are a thread, and the world is still in use)
+        process = multiprocessing.get_context('spawn').Process(
+            target=Journal.__compact_files__, args=(self.__filename__, end, compacted))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            return
+        with self.__lock__:
+            with open(self.journal_filename, 'rb') as journal_file:
+                journal_file.seek(end)
+                tail = journal_file.read()
+            with open(compacted + Journal.__suffix__, 'wb') as journal_file:
+                journal_file.write(tail)
+            # (a crash between these leaves frames already in the new base in the
+            #  log - replaying them again is harmless)
+            os.replace(compacted, self.__filename__)
+            os.replace(compacted + Journal.__suffix__, self.journal_filename)
+
+    # run in a separate process - so as to share nothing with the live world
+    @staticmethod
+    def __compact_files__(filename: str, end: int, compacted: str):
+        world = World.load_from_file(filename)
+        Journal.replay(world, filename + Journal.__suffix__, end)
+        world.store_to_file(compacted)
+
+    def close(self):
+        """
+        save what has changed, and wait for any compaction to finish
+        """
+        self.save()
+        if self.__compactor__ is not None:
+            self.__compactor__.join()
+
+    @staticmethod
+    def frames(journal_filename: str, end: int = None):
+        """
+        the frames in the log (up to end) - stopping at any frame torn by a crash
+        """
+        if not os.path.exists(journal_filename):
+            return
+        with open(journal_filename, 'rb') as journal_file:
+            data = journal_file.read() if end is None else journal_file.read(end)
+        position = 0
+        while position + Journal.__length_bytes__ <= len(data):
+            length = int.from_bytes(
+                data[position:position + Journal.__length_bytes__], 'little')
+            position += Journal.__length_bytes__
+            if position + length > len(data):
+                return
+            try:
+                frame = pickle.loads(data[position:position + length])
+            except Exception:
+                return
+            position += length
+            yield frame
+
+    @staticmethod
+    def replay(world: 'World', journal_filename: str, end: int = None) -> int:
+        """
+        apply the frames in the log to world (as loaded from its base snapshot),
+        returning how many were applied
+        """
+        people: Dict[int, Person] = dict(world.__members_by_id__)
+        families: Dict[int, Family] = dict(world.__families_by_id__)
+        communities: Dict[int, Community] = {
+            community.id: community for community in world.all_communities}
+        count = 0
+        for frame in Journal.frames(journal_filename, end):
+            count += 1
+            for person_id, state in frame['people']:
+                person = people.get(person_id)
+                if person is None:
+                    person = people[person_id] = Person.__new__(Person)
+                    state = {**state, '__action_history__': ActionHistory()}
+                person.__setstate__(state)
+            for person_id, start, entries in frame['actions']:
+                history = people[person_id].all_actions
+                for index, (when, entry) in enumerate(entries, start):
+                    # (already in the snapshot, if it was compacted part-way)
+                    if index >= len(history):
+                        history.append_entry(when, *entry)
+            for family_id, name, community_id, parent_ids, child_ids, pets in frame['families']:
+                family = families.get(family_id)
+                if family is None:
+                    family = families[family_id] = Family.__new__(Family)
+                family.__setstate__({
+                    '__family_id__': family_id, '__family_name__': name,
+                    '__community_id__': community_id,
+                    '__parents__': [people[person_id] for person_id in parent_ids],
+                    '__children__': [people[person_id] for person_id in child_ids],
+                    '__pets__': pets})
+            for community_id, name, family_ids in frame['communities']:
+                community = communities.get(community_id)
+                if community is None:
+                    community = communities[community_id] = Community.__new__(Community)
+                community.__setstate__({
+                    '__community_id__': community_id, '__community_name__': name,
+                    '__world_id__': world.id,
+                    '__all_families__': [families[family_id] for family_id in family_ids]})
+            name, community_ids = frame['world']
+            world.__world_name__ = name
+            world.__all_communities__ = [communities[community_id]
+                                         for community_id in community_ids]
+            World.__set_id_counters__(frame['counters'])
+        if count > 0:
+            # re-build the derived indexes - exactly as un-pickling does
+            for community in world.all_communities:
+                for family in community.all_families:
+                    family.__setstate__(family.__getstate__())
+                community.__setstate__(community.__getstate__())
+            world.__setstate__(world.__getstate__())
+        return count
+
+
+class LazyActionHistory(ActionHistory):
+    """
+    LazyActionHistory class - an action history in a Snapshot (or Database), only
+    read (and turned into a plain ActionHistory) when first used
+    """
+    __slots__ = ()
+    # what may be used without reading the history
+    __deferred__ = ('__class__', 'set_retention')
+
+    def __init__(self, source, *where):
+        # where to read it from - source.read(*where) - is held in the codes slot
+        #  until then
+        self.__codes__ = (source, where)
+        self.__retention__ = None
+
+    def __getattribute__(self, name: str):
+        if name not in LazyActionHistory.__deferred__ and \
+                object.__getattribute__(self, '__class__') is LazyActionHistory:
+            LazyActionHistory.__read__(self)
+        return object.__getattribute__(self, name)
+
+    @staticmethod
+    def __read__(history: 'LazyActionHistory'):
+        source, where = object.__getattribute__(history, '__codes__')
+        retention = object.__getattribute__(history, '__retention__')
+        object.__setattr__(history, '__class__', ActionHistory)
+        history.__setstate__(source.read(*where))
+        if retention is not None:
+            history.set_retention(retention)
+
+    # (our world sets this as we join it - which should not need us read)
+    def set_retention(self, retention: ActionRetention):
+        assert retention is None or isinstance(
+            retention, ActionRetention), 'invalid action retention'
+        self.__retention__ = retention
+
+
+class Snapshot:
+    """
+    Snapshot class - a world saved (by World.store_to_snapshot) in a versioned binary
+    format: a header, then a separately-pickled record for each person, each person's
+    action history, each family and community, and the world - and finally a table of
+    where each record is
+
+    The file is read through mmap, and records are only un-pickled as needed:
+    community(), family() and person() materialize just what they are asked for (each
+    object once), and action histories are not read until first used. world()
+    materializes the whole world (bar the action histories)
+    """
+    __magic__: bytes = b'UNIVERSE'
+    # 2 - action histories hold their free text apart from the shared strings
+    __format_version__: int = 2
+    # magic, version, table-offset, table-length
+    __header_bytes__: int = 8 + 4 + 8 + 8
+    # the snapshots open - so that those of a file about to be written over can be
+    #  let go of first
+    __open__ = weakref.WeakSet()
+
+    def __init__(self, filename: str):
+        assert isinstance(filename, str), 'invalid file name'
+        self.__filename__: str = filename
+        self.__path__: str = os.path.realpath(filename)
+        with open(filename, 'rb') as snapshot_file:
+            self.__map__ = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        Snapshot.__open__.add(self)
+        header = self.__map__[:Snapshot.__header_bytes__]
+        assert header[:8] == Snapshot.__magic__, filename + ' is not a world snapshot'
+        version = int.from_bytes(header[8:12], 'little')
+        assert version <= Snapshot.__format_version__, filename + \
+            ' is a newer snapshot format (' + str(version) + ') - cannot read'
+        self.__table__: dict = self.read(int.from_bytes(header[12:20], 'little'),
+                                         int.from_bytes(header[20:28], 'little'))
+        # id -> the objects materialized so far
+        self.__people__: Dict[int, Person] = {}
+        self.__families__: Dict[int, Family] = {}
+        self.__communities__: Dict[int, Community] = {}
+
+    def read(self, offset: int, length: int):
+        assert self.__map__ is not None, self.__filename__ + ' snapshot has been closed'
+        return pickle.loads(self.__map__[offset:offset + length])
+
+    def close(self):
+        """
+        stop reading the file - any action histories not yet read can no longer be
+        """
+        Snapshot.__open__.discard(self)
+        if self.__map__ is not None:
+            self.__map__.close()
+        self.__map__ = None
+
+    # only to be called before filename is written over - reads each action history
+    #  still to be read from a snapshot of it, and returns those snapshots (to be
+    #  closed once the file has been replaced)
+    @staticmethod
+    def __release__(filename: str) -> List['Snapshot']:
+        path = os.path.realpath(filename)
+        snapshots = [snapshot for snapshot in list(Snapshot.__open__)
+                     if snapshot.__path__ == path and snapshot.__map__ is not None]
+        for snapshot in snapshots:
+            for person in snapshot.__people__.values():
+                if type(person.__action_history__) is LazyActionHistory:
+                    LazyActionHistory.__read__(person.__action_history__)
+        return snapshots
+
+    # write to filename by way of a temporary file, which then replaces it in one go -
+    #  so that a world can be saved over the snapshot it was loaded from
+    @staticmethod
+    def __replace__(filename: str, write):
+        released = Snapshot.__release__(filename)
+        with open(filename + '.tmp', 'wb') as file_to_store:
+            write(file_to_store)
+        os.replace(filename + '.tmp', filename)
+        for snapshot in released:
+            snapshot.close()
+
+    @staticmethod
+    def write(world: 'World', filename: str):
+        Snapshot.__replace__(filename,
+                             lambda snapshot_file: Snapshot.__write__(world, snapshot_file))
+
+    @staticmethod
+    def __write__(world: 'World', snapshot_file):
+        table = {'people': {}, 'histories': {}, 'families': {}, 'communities': {}}
+        snapshot_file.write(bytes(Snapshot.__header_bytes__))
+
+        def put(record) -> tuple:
+            payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+            offset = snapshot_file.tell()
+            snapshot_file.write(payload)
+            return offset, len(payload)
+        #
+        for community in world.all_communities:
+            for family in community.all_families:
+                for person in family.parents + family.children:
+                    if person.id in table['people']:
+                        continue
+                    state = person.__getstate__()
+                    table['histories'][person.id] = put(
+                        state.pop('__action_history__').__getstate__())
+                    table['people'][person.id] = put(state)
+                state = family.__getstate__()
+                state['__parents__'] = [parent.id for parent in family.parents]
+                state['__children__'] = [child.id for child in family.children]
+                table['families'][family.id] = put(state)
+            state = community.__getstate__()
+            state['__all_families__'] = [family.id for family in community.all_families]
+            table['communities'][community.id] = (*put(state), community.name)
+        state = world.__getstate__()
+        state['__all_communities__'] = [community.id for community in world.all_communities]
+        table['world'] = put(state)
+        table['counters'] = World.__id_counters__()
+        table_offset, table_length = put(table)
+        snapshot_file.seek(0)
+        snapshot_file.write(Snapshot.__magic__ +
+                            Snapshot.__format_version__.to_bytes(4, 'little') +
+                            table_offset.to_bytes(8, 'little') +
+                            table_length.to_bytes(8, 'little'))
+
+    # the (Community, Family, Person) ID-counters when the snapshot was written
+    @property
+    def counters(self) -> tuple: return self.__table__['counters']
+
+    @property
+    def community_ids(self) -> List[int]: return list(self.__table__['communities'])
+
+    def community_named(self, name: str) -> Community:
+        for community_id, (_, _, community_name) in self.__table__['communities'].items():
+            if community_name == name:
+                return self.community(community_id)
+        return None
+
+    def person(self, person_id: int) -> Person:
+        person = self.__people__.get(person_id)
+        if person is None:
+            person = Person.__new__(Person)
+            history = LazyActionHistory(self, *self.__table__['histories'][person_id])
+            person.__setstate__({**self.read(*self.__table__['people'][person_id]),
+                                 '__action_history__': history})
+            self.__people__[person_id] = person
+        return person
+
+    def family(self, family_id: int) -> Family:
+        family = self.__families__.get(family_id)
+        if family is None:
+            state = self.read(*self.__table__['families'][family_id])
+            state['__parents__'] = [self.person(person_id) for person_id in state['__parents__']]
+            state['__children__'] = [self.person(person_id) for person_id in state['__children__']]
+            family = Family.__new__(Family)
+            family.__setstate__(state)
+            self.__families__[family_id] = family
+        return family
+
+    def community(self, community_id: int) -> Community:
+        community = self.__communities__.get(community_id)
+        if community is None:
+            offset, length, _ = self.__table__['communities'][community_id]
+            state = self.read(offset, length)
+            state['__all_families__'] = [self.family(family_id)
+                                         for family_id in state['__all_families__']]
+            community = Community.__new__(Community)
+            community.__setstate__(state)
+            self.__communities__[community_id] = community
+        return community
+
+    def world(self) -> 'World':
+        state = self.read(*self.__table__['world'])
+        state['__all_communities__'] = [self.community(community_id)
+                                        for community_id in state['__all_communities__']]
+        world = World.__new__(World)
+        world.__setstate__(state)
+        return world
+
+
+class Shards:
+    """
+    Shards class - a world saved (by World.store_to_shards) as a directory holding a
+    manifest (the world's own state, the ID-counters and the people who are members
+    of more than one community) and a (compressed) shard per community
+
+    The shards are written by a pool of processes - forked, so each already has the
+    world to hand - and read (and decompressed) by a pool of threads, each being
+    un-pickled as soon as it is in. Each save writes shards of its own (named for it),
+    so the manifest in place always names a complete set - those it no longer names
+    being deleted once it is replaced
+    """
+    # 2 - action histories hold their free text apart from the shared strings
+    __format_version__: int = 2
+    __manifest__: str = 'manifest.pkl'
+    # what the (forked) writer processes are to write - (world, shared person-ids,
+    #  directory, save-id)
+    __storing__: tuple = None
+
+    @staticmethod
+    def __shard_name__(community: Community, save_id: str) -> str:
+        return 'community-' + str(community.id) + '-' + save_id + '.shard'
+
+    @staticmethod
+    def write(world: 'World', directory: str, processes: int = None):
+        os.makedirs(directory, exist_ok=True)
+        # people in more than one community go in the manifest, and the shards
+        #  just refer to them (by ID)
+        community_counts: Dict[int, int] = {}
+        for community in world.all_communities:
+            for person_id in community.__member_counts__:
+                community_counts[person_id] = community_counts.get(person_id, 0) + 1
+        shared = {person_id for person_id, count in community_counts.items() if count > 1}
+        #
+        indexes = range(len(world.all_communities))
+        Shards.__storing__ = (world, shared, directory, uuid.uuid4().hex)
+        try:
+            if 'fork' in multiprocessing.get_all_start_methods() and len(indexes) > 1:
+                # (histories not yet read are read first - a forked copy of what
+                #  they are read from, e.g. a database connection, is not to be used)
+                for person in world.members:
+                    if type(person.__action_history__) is LazyActionHistory:
+                        LazyActionHistory.__read__(person.__action_history__)
+                with concurrent.futures.ProcessPoolExecutor(
+                        processes, mp_context=multiprocessing.get_context('fork')) as pool:
+                    shard_names = list(pool.map(Shards.__write_shard__, indexes))
+            else:
+                shard_names = [Shards.__write_shard__(index) for index in indexes]
+        finally:
+            Shards.__storing__ = None
+        #
+        state = world.__getstate__()
+        del state['__all_communities__']
+        manifest = {'version': Shards.__format_version__,
+                    'counters': World.__id_counters__(),
+                    'world': state,
+                    'shards': shard_names,
+                    'shared': [world.person_by_id(person_id) for person_id in shared]}
+        # the manifest is written last - and replaced in one go
+        manifest_file = os.path.join(directory, Shards.__manifest__)
+        with open(manifest_file + '.new', 'wb') as file_to_store:
+            pickle.dump(manifest, file_to_store)
+        os.replace(manifest_file + '.new', manifest_file)
+        # (the shards of earlier saves - or of any cut short)
+        for filename in set(os.listdir(directory)) - set(shard_names):
+            if filename.startswith('community-') and filename.endswith('.shard'):
+                os.remove(os.path.join(directory, filename))
+
+    # run in a writer process
+    @staticmethod
+    def __write_shard__(index: int) -> str:
+        world, shared, directory, save_id = Shards.__storing__
+        community = world.all_communities[index]
+        buffer = io.BytesIO()
+        pickler = pickle.Pickler(buffer, protocol=pickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = lambda obj: obj.id if isinstance(
+            obj, Person) and obj.id in shared else None
+        pickler.dump(community)
+        shard_name = Shards.__shard_name__(community, save_id)
+        with open(os.path.join(directory, shard_name), 'wb') as shard_file:
+            shard_file.write(zlib.compress(buffer.getvalue(), 1))
+        return shard_name
+
+    @staticmethod
+    def __read_shard__(filename: str) -> bytes:
+        with open(filename, 'rb') as shard_file:
+            return zlib.decompress(shard_file.read())
+
+    @staticmethod
+    def read(directory: str, threads: int = None) -> tuple:
+        """
+        the (world, ID-counters) saved in directory
+        """
+        with open(os.path.join(directory, Shards.__manifest__), 'rb') as file_to_load:
+            manifest = pickle.load(file_to_load)
+        assert manifest['version'] <= Shards.__format_version__, directory + \
+            ' is a newer shard format (' + str(manifest['version']) + ') - cannot read'
+        shared = {person.id: person for person in manifest['shared']}
+        communities = []
+        with concurrent.futures.ThreadPoolExecutor(threads) as pool:
+            for payload in pool.map(Shards.__read_shard__,
+                                    [os.path.join(directory, shard_name)
+                                     for shard_name in manifest['shards']]):
+                unpickler = pickle.Unpickler(io.BytesIO(payload))
+                unpickler.persistent_load = shared.__getitem__
+                communities.append(unpickler.load())
+        state = manifest['world']
+        state['__all_communities__'] = communities
+        world = World.__new__(World)
+        world.__setstate__(state)
+        return world, manifest['counters']
+
+
+class RecordStream:
+    """
+    RecordStream class - a world as a stream of (JSON-able) records, one per line of
+    newline-delimited JSON: the world, then each community, person, and family (each
+    followed by its pets). See World.export_stream/import_stream
+    """
+    # 2 - measured actions carry their quantity as a number
+    __format_version__: int = 2
+    # the enums and animal-classes a record may name
+    __enums__: Dict[str, type] = {enum.__name__: enum for enum in (
+        Gender, Movement, Emotion, Action, HairColor)}
+    __species__: Dict[str, type] = {species.__name__: species for species in (
+        Animal, Bird, Fish, Mammal, Cat, Dog)}
+
+    @staticmethod
+    def __encode__(value):
+        if isinstance(value, Enum):
+            return {'enum': type(value).__name__, 'name': value.name}
+        if isinstance(value, datetime.datetime):
+            return {'datetime': value.isoformat()}
+        if isinstance(value, datetime.date):
+            return {'date': value.isoformat()}
+        if isinstance(value, dict):
+            return {'items': [[RecordStream.__encode__(key), RecordStream.__encode__(item)]
+                              for key, item in value.items()]}
+        return value
+
+    @staticmethod
+    def __decode__(value):
+        if not isinstance(value, dict):
+            return value
+        if 'enum' in value:
+            return RecordStream.__enums__[value['enum']][value['name']]
+        if 'datetime' in value:
+            return datetime.datetime.fromisoformat(value['datetime'])
+        if 'date' in value:
+            return datetime.date.fromisoformat(value['date'])
+        return {RecordStream.__decode__(key): RecordStream.__decode__(item)
+                for key, item in value['items']}
+
+    # an animal's state - its slots (bar the action history) by plain name, and its
+    #  actions as [time, action-name, *strings] - or, for a measured action, [time,
+    #  action-name, quantity, units] (see ActionHistory.entry_of)
+    @staticmethod
+    def __animal_record__(animal: Animal) -> dict:
+        state = animal.__getstate__()
+        history = state.pop('__action_history__')
+        return {'state': {name.strip('_'): RecordStream.__encode__(value)
+                          for name, value in state.items()},
+                'actions': [[when, entry[0].name, *entry[1:]]
+                            for when, entry in history.entries_since(0)]}
+
+    @staticmethod
+    def __animal_from__(species: type, record: dict) -> Animal:
+        animal = species.__new__(species)
+        history = ActionHistory()
+        for when, action_name, *args in record['actions']:
+            history.append_entry(when, Action[action_name], *args)
+        state = {'__' + name + '__': RecordStream.__decode__(value)
+                 for name, value in record['state'].items()}
+        state['__action_history__'] = history
+        animal.__setstate__(state)
+        return animal
+
+    @staticmethod
+    def records(world: 'World'):
+        """
+        (a generator of) the records of world
+        """
+        yield {'type': 'world', 'version': RecordStream.__format_version__,
+               'id': world.id, 'name': world.name,
+               'counters': list(World.__id_counters__())}
+        for community in world.all_communities:
+            yield {'type': 'community', 'id': community.id, 'name': community.name}
+        for person in world.__members_by_id__.values():
+            yield {'type': 'person', 'id': person.id, **RecordStream.__animal_record__(person)}
+        for community in world.all_communities:
+            for family in community.all_families:
+                yield {'type': 'family', 'id': family.id, 'name': family.name,
+                       'community_id': community.id,
+                       'parent_ids': [parent.id for parent in family.parents],
+                       'child_ids': [child.id for child in family.children]}
+                for pet in family.pets:
+                    yield {'type': 'pet', 'species': type(pet).__name__,
+                           'family_id': family.id, **RecordStream.__animal_record__(pet)}
+
+    @staticmethod
+    def world_from(records) -> tuple:
+        """
+        the (world, ID-counters) built - a record at a time - from records
+        """
+        world: 'World' = None
+        counters = None
+        communities: Dict[int, Community] = {}
+        families: Dict[int, Family] = {}
+        people: Dict[int, Person] = {}
+        for record in records:
+            record_type = record['type']
+            if record_type == 'world':
+                assert record['version'] <= RecordStream.__format_version__, \
+                    'newer record format (' + str(record['version']) + ') - cannot read'
+                world = World.__new__(World)
+                world.__setstate__({'__world_id__': record['id'],
+                                    '__world_name__': record['name'],
+                                    '__all_communities__': []})
+                counters = tuple(record['counters'])
+            elif record_type == 'community':
+                community = communities[record['id']] = Community.__new__(Community)
+                community.__setstate__({'__community_id__': record['id'],
+                                        '__community_name__': record['name'],
+                                        '__world_id__': None, '__all_families__': []})
+                world.community_add(community)
+            elif record_type == 'person':
+                people[record['id']] = RecordStream.__animal_from__(Person, record)
+            elif record_type == 'family':
+                family = families[record['id']] = Family.__new__(Family)
+                family.__setstate__({
+                    '__family_id__': record['id'], '__family_name__': record['name'],
+                    '__community_id__': None,
+                    '__parents__': [people[person_id] for person_id in record['parent_ids']],
+                    '__children__': [people[person_id] for person_id in record['child_ids']],
+                    '__pets__': []})
+                communities[record['community_id']].family_add(family)
+            elif record_type == 'pet':
+                pet = RecordStream.__animal_from__(
+                    RecordStream.__species__[record['species']], record)
+                family = families[record['family_id']]
+                family.__pets__.append(pet)
+                family.__pet_set__.add(pet)
+            else:
+                assert False, 'unknown record type ' + str(record_type)
+        assert world is not None, 'no world record'
+        return world, counters
+
+
+class Database:
+    """
+    Database class - a world kept in a (local) SQLite database: a row per community,
+    family, person and action, each object's remaining state pickled alongside, with
+    indexes on family-membership, and on people's names and dates-of-birth
+
+    Once attached (World.attach_database, or World.load_from_database) the world
+    tells us what changes, and those changes are written behind - in a single
+    transaction, once batch_size objects have changed (or on flush()). Only the
+    actions done since the last write are added.
+
+    Objects are materialized at most once (an identity-map, holding the most recently
+    used cache_size people in memory), and action histories only when first used.
+    Without a world attached, community(), family() and person() load just part of
+    the world - a family along with its whole community - which then joins a
+    "partial" world of its own, so that its changes are written behind too. Adding
+    or removing communities, though, takes the whole world (see world())
+    """
+    # 2 - measured actions carry their quantity as a number, communities and
+    #  families are ordered by the world and community rows
+    __format_version__: int = 2
+    __schema__: List[str] = [
+        'CREATE TABLE IF NOT EXISTS world (key TEXT PRIMARY KEY, value BLOB)',
+        # family_ids: the ids of its families, in order (an array of int64)
+        'CREATE TABLE IF NOT EXISTS communities (id INTEGER PRIMARY KEY, name TEXT,'
+        ' state BLOB, family_ids BLOB)',
+        'CREATE TABLE IF NOT EXISTS families (id INTEGER PRIMARY KEY, community_id INTEGER,'
+        ' name TEXT, state BLOB)',
+        'CREATE TABLE IF NOT EXISTS people (id INTEGER PRIMARY KEY, name TEXT, folded_name TEXT,'
+        ' dob_key INTEGER, gender TEXT, is_alive INTEGER, state BLOB)',
+        # role: 0 - parent, 1 - child
+        'CREATE TABLE IF NOT EXISTS members (family_id INTEGER, role INTEGER, position INTEGER,'
+        ' person_id INTEGER, PRIMARY KEY (family_id, role, position)) WITHOUT ROWID',
+        # a measured action's quantity (int or float - so no declared type) and units,
+        #  any other's strings as a JSON list (args)
+        'CREATE TABLE IF NOT EXISTS actions (person_id INTEGER, seq INTEGER, time REAL,'
+        ' action TEXT, args TEXT, quantity, units TEXT, PRIMARY KEY (person_id, seq))'
+        ' WITHOUT ROWID',
+        'CREATE INDEX IF NOT EXISTS members_by_person ON members (person_id)',
+        'CREATE INDEX IF NOT EXISTS people_by_name ON people (folded_name)',
+        'CREATE INDEX IF NOT EXISTS people_by_dob ON people (dob_key)',
+    ]
+
+    def __init__(self, filename: str, batch_size: int = 1000, cache_size: int = 10000):
+        assert isinstance(filename, str) and filename.strip() != '', 'invalid file name'
+        assert isinstance(batch_size, int) and batch_size > 0, 'invalid batch size'
+        assert isinstance(cache_size, int) and cache_size >= 0, 'invalid cache size'
+        self.__filename__: str = filename.strip()
+        self.__connection__ = sqlite3.connect(self.__filename__)
+        version, = self.__connection__.execute('PRAGMA user_version').fetchone()
+        if version != Database.__format_version__:
+            assert version == 0 and self.__connection__.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE name = 'world'").fetchone()[0] == 0, \
+                self.__filename__ + ' is not a world database (of format version ' + \
+                str(Database.__format_version__) + ')'
+        with self.__connection__:
+            for statement in Database.__schema__:
+                self.__connection__.execute(statement)
+            self.__connection__.execute(
+                'PRAGMA user_version = ' + str(Database.__format_version__))
+        self.__batch_size__: int = batch_size
+        self.__cache_size__: int = cache_size
+        # the world whose changes we write behind (once attached) - and whether it is
+        #  just the part of our world loaded so far (see community())
+        self.__world__: 'World' = None
+        self.__partial__: bool = False
+        # id -> the objects materialized (or attached) so far
+        self.__people__: Dict[int, Person] = weakref.WeakValueDictionary()
+        self.__families__: Dict[int, Family] = weakref.WeakValueDictionary()
+        self.__communities__: Dict[int, Community] = weakref.WeakValueDictionary()
+        # the most recently used people - kept in memory
+        self.__hot__: OrderedDict = OrderedDict()
+        # what has changed since the last write - id -> object
+        self.__changed_people__: Dict[int, Person] = {}
+        self.__changed_families__: Dict[int, Family] = {}
+        self.__changed_communities__: Dict[int, Community] = {}
+        # the ids of those who have left the world since the last write
+        self.__left_people__: Set[int] = set()
+        # person-id -> how many of their actions are written (as counted when needed)
+        self.__saved_actions__: Dict[int, int] = {}
+
+    @property
+    def filename(self) -> str: return self.__filename__
+
+    # only to be called by World.attach_database/load_from_database
+    def __attach__(self, world: 'World', write_all: bool):
+        self.__world__ = world
+        self.__partial__ = False
+        for community in world.all_communities:
+            self.__communities__[community.id] = community
+            for family in community.all_families:
+                self.__families__[family.id] = family
+        for person in world.members:
+            self.__people__[person.id] = person
+        if write_all:
+            for community in world.all_communities:
+                self.__changed_communities__[community.id] = community
+                for family in community.all_families:
+                    self.__changed_families__[family.id] = family
+            for person in world.members:
+                self.__changed_people__[person.id] = person
+                self.__saved_actions__[person.id] = 0
+            # (replacing whatever was there - in the one transaction)
+            with self.__connection__:
+                for table in ('world', 'communities', 'families', 'people', 'members', 'actions'):
+                    self.__connection__.execute('DELETE FROM ' + table)
+                self.__write__()
+
+    # only to be called by our world - as its members, families and communities change
+    def __person_changed__(self, person: Person):
+        self.__changed_people__[person.id] = person
+        self.__changes_made__()
+
+    def __person_joined__(self, person: Person):
+        self.__people__[person.id] = person
+        self.__left_people__.discard(person.id)
+        if not self.__partial__:
+            # (re-written in full - they were deleted while away)
+            self.__saved_actions__[person.id] = 0
+        self.__person_changed__(person)
+
+    def __person_left__(self, person: Person):
+        if self.__partial__:
+            # (they may well be in a family not loaded - so are kept, as is writing
+            #  their changes)
+            person.__world__ = self.__world__
+            self.__person_changed__(person)
+            return
+        self.__changed_people__.pop(person.id, None)
+        self.__saved_actions__.pop(person.id, None)
+        self.__left_people__.add(person.id)
+        self.__changes_made__()
+
+    def __family_changed__(self, family: Family):
+        self.__families__[family.id] = family
+        self.__changed_families__[family.id] = family
+        self.__changes_made__()
+
+    def __community_changed__(self, community: Community):
+        self.__communities__[community.id] = community
+        self.__changed_communities__[community.id] = community
+        self.__changes_made__()
+
+    def __changes_made__(self):
+        if len(self.__changed_people__) + len(self.__changed_families__) + \
+                len(self.__changed_communities__) + len(self.__left_people__) >= \
+                self.__batch_size__:
+            self.flush()
+
+    def flush(self):
+        """
+        write what has changed - in a single transaction
+        """
+        if self.__world__ is not None:
+            with self.__connection__:
+                self.__write__()
+
+    # an array of the ids of objects, as written
+    @staticmethod
+    def __ids_of__(objects: list) -> bytes:
+        return array('q', [o.id for o in objects]).tobytes()
+
+    @staticmethod
+    def __ids_from__(data: bytes) -> List[int]:
+        ids = array('q')
+        ids.frombytes(data)
+        return ids.tolist()
+
+    # person-id -> how many of their actions are written
+    def __saved_count__(self, person_id: int) -> int:
+        count = self.__saved_actions__.get(person_id)
+        if count is None:
+            count, = self.__connection__.execute(
+                'SELECT COUNT(*) FROM actions WHERE person_id = ?', (person_id,)).fetchone()
+            self.__saved_actions__[person_id] = count
+        return count
+
+    # only to be called by flush()/__attach__ - within their transaction
+    def __write__(self):
+        execute = self.__connection__.execute
+        executemany = self.__connection__.executemany
+        left = [(person_id,) for person_id in self.__left_people__]
+        executemany('DELETE FROM people WHERE id = ?', left)
+        executemany('DELETE FROM actions WHERE person_id = ?', left)
+        people = []
+        actions = []
+        for person in self.__changed_people__.values():
+            state = person.__getstate__()
+            del state['__action_history__']
+            people.append((person.id, person.name, person.name.casefold(),
+                           Animal.__date_key__(person.dob), person.gender.name,
+                           int(person.is_alive), pickle.dumps(state)))
+            history = person.__action_history__
+            # (one not yet read has nothing new)
+            if type(history) is LazyActionHistory:
+                continue
+            saved = self.__saved_count__(person.id)
+            if len(history) > saved:
+                for seq, (when, entry) in enumerate(history.entries_since(saved), saved):
+                    if ActionHistory.is_measure(entry):
+                        actions.append((person.id, seq, when, entry[0].name, None,
+                                        entry[1], entry[2]))
+                    else:
+                        actions.append((person.id, seq, when, entry[0].name,
+                                        json.dumps(entry[1:]), None, None))
+                self.__saved_actions__[person.id] = len(history)
+        executemany('INSERT OR REPLACE INTO people VALUES (?, ?, ?, ?, ?, ?, ?)', people)
+        executemany('INSERT OR REPLACE INTO actions VALUES (?, ?, ?, ?, ?, ?, ?)', actions)
+        families = []
+        members = []
+        for family in self.__changed_families__.values():
+            state = family.__getstate__()
+            for key in ('__parents__', '__children__', '__community_id__'):
+                del state[key]
+            families.append((family.id, family.community_id, family.name, pickle.dumps(state)))
+            members.extend([(family.id, 0, position, parent.id)
+                            for position, parent in enumerate(family.parents)])
+            members.extend([(family.id, 1, position, child.id)
+                            for position, child in enumerate(family.children)])
+        executemany('INSERT OR REPLACE INTO families VALUES (?, ?, ?, ?)', families)
+        executemany('DELETE FROM members WHERE family_id = ?',
+                    [(family.id,) for family in self.__changed_families__.values()])
+        executemany('INSERT INTO members VALUES (?, ?, ?, ?)', members)
+        communities = []
+        for community in self.__changed_communities__.values():
+            state = community.__getstate__()
+            for key in ('__all_families__', '__world_id__'):
+                del state[key]
+            communities.append((community.id, community.name, pickle.dumps(state),
+                                Database.__ids_of__(community.all_families)))
+        executemany('INSERT OR REPLACE INTO communities VALUES (?, ?, ?, ?)', communities)
+        # and the world itself - which communities it has (in order), unless we have
+        #  just part of it - and the ID-counters
+        if not self.__partial__:
+            state = self.__world__.__getstate__()
+            del state['__all_communities__']
+            executemany('INSERT OR REPLACE INTO world VALUES (?, ?)', [
+                ('state', pickle.dumps(state)),
+                ('community_ids', pickle.dumps([c.id for c in self.__world__.all_communities]))])
+        execute('INSERT OR REPLACE INTO world VALUES (?, ?)',
+                ('counters', pickle.dumps(World.__id_counters__())))
+        self.__changed_people__.clear()
+        self.__left_people__.clear()
+        self.__changed_families__.clear()
+        self.__changed_communities__.clear()
+
+    def close(self):
+        """
+        write what has changed, and close the database - first reading the action
+        histories still to be read from it (they cannot be once it is closed)
+        """
+        self.flush()
+        for person in list(self.__people__.values()):
+            if type(person.__action_history__) is LazyActionHistory:
+                LazyActionHistory.__read__(person.__action_history__)
+        if self.__world__ is not None and self.__world__.__database__ is self:
+            self.__world__.__database__ = None
+        self.__world__ = None
+        self.__connection__.close()
+
+    # (for LazyActionHistory) the state of a person's action history
+    def read(self, person_id: int) -> dict:
+        history = ActionHistory()
+        for when, action_name, args, quantity, units in self.__connection__.execute(
+                'SELECT time, action, args, quantity, units FROM actions WHERE person_id = ?'
+                ' ORDER BY seq', (person_id,)):
+            if args is None:
+                history.append_entry(when, Action[action_name], quantity, units)
+            else:
+                history.append_entry(when, Action[action_name], *json.loads(args))
+        return history.__getstate__()
+
+    def __world_value__(self, key: str):
+        row = self.__connection__.execute(
+            'SELECT value FROM world WHERE key = ?', (key,)).fetchone()
+        assert row is not None, self.__filename__ + ' holds no world'
+        return pickle.loads(row[0])
+
+    # the (Community, Family, Person) ID-counters when last written
+    @property
+    def counters(self) -> tuple: return self.__world_value__('counters')
+
+    # the world our partial loads join (see community()) - with none of the optional
+    #  indexes, as they would be of just what is loaded
+    def __partial_world__(self) -> 'World':
+        if self.__world__ is None:
+            state = self.__world_value__('state')
+            for key in ('__name_index__', '__action_index__', '__population_store__',
+                        '__flag_bitmaps__', '__attribute_indexes__', '__kinship__'):
+                state[key] = False
+            state['__all_communities__'] = []
+            world = World.__new__(World)
+            world.__setstate__(state)
+            world.__database__ = self
+            self.__world__ = world
+            self.__partial__ = True
+            # (so that those added to it are not given ids already written)
+            World.__set_id_counters__(map(max, World.__id_counters__(), self.counters))
+        return self.__world__
+
+    # whether what we materialize is part of a loaded world - or joins our partial one
+    def __loading_part__(self) -> bool:
+        return self.__world__ is None or self.__partial__
+
+    def person(self, person_id: int) -> Person:
+        person = self.__person__(person_id)
+        if person is not None and person.__world__ is None and self.__loading_part__():
+            # (not a member of what is loaded - but its changes are written all the same)
+            person.__world__ = self.__partial_world__()
+        return person
+
+    def __person__(self, person_id: int) -> Person:
+        person = self.__people__.get(person_id)
+        if person is None:
+            row = self.__connection__.execute(
+                'SELECT state FROM people WHERE id = ?', (person_id,)).fetchone()
+            if row is None:
+                return None
+            person = Person.__new__(Person)
+            person.__setstate__({**pickle.loads(row[0]),
+                                 '__action_history__': LazyActionHistory(self, person_id)})
+            self.__people__[person_id] = person
+        if self.__cache_size__ > 0:
+            self.__hot__[person_id] = person
+            self.__hot__.move_to_end(person_id)
+            if len(self.__hot__) > self.__cache_size__:
+                self.__hot__.popitem(last=False)
+        return person
+
+    def family(self, family_id: int) -> Family:
+        family = self.__families__.get(family_id)
+        if family is None:
+            row = self.__connection__.execute(
+                'SELECT community_id FROM families WHERE id = ?', (family_id,)).fetchone()
+            if row is None:
+                return None
+            if row[0] is not None and self.__loading_part__():
+                self.community(row[0])
+                family = self.__families__.get(family_id)
+            if family is None:
+                # (in no community - so in no world)
+                family = self.__family__(family_id)
+        return family
+
+    def __family__(self, family_id: int) -> Family:
+        family = self.__families__.get(family_id)
+        if family is None:
+            row = self.__connection__.execute(
+                'SELECT community_id, state FROM families WHERE id = ?', (family_id,)).fetchone()
+            members = self.__connection__.execute(
+                'SELECT role, person_id FROM members WHERE family_id = ? ORDER BY role, position',
+                (family_id,)).fetchall()
+            family = Family.__new__(Family)
+            family.__setstate__({
+                **pickle.loads(row[1]), '__community_id__': row[0],
+                '__parents__': [self.__person__(person_id)
+                                for role, person_id in members if role == 0],
+                '__children__': [self.__person__(person_id)
+                                 for role, person_id in members if role == 1]})
+            self.__families__[family_id] = family
+        return family
+
+    def community(self, community_id: int) -> Community:
+        community = self.__communities__.get(community_id)
+        if community is None:
+            community = self.__community__(community_id)
+            if community is not None and self.__loading_part__():
+                world = self.__partial_world__()
+                # (joining as read - so nothing to write)
+                world.__database__ = None
+                world.community_add(community)
+                world.__database__ = self
+        return community
+
+    def __community__(self, community_id: int) -> Community:
+        community = self.__communities__.get(community_id)
+        if community is None:
+            row = self.__connection__.execute(
+                'SELECT state, family_ids FROM communities WHERE id = ?',
+                (community_id,)).fetchone()
+            if row is None:
+                return None
+            community = Community.__new__(Community)
+            community.__setstate__({
+                **pickle.loads(row[0]), '__world_id__': None,
+                '__all_families__': [self.__family__(family_id)
+                                     for family_id in Database.__ids_from__(row[1])]})
+            self.__communities__[community_id] = community
+        return community
+
+    def world(self) -> 'World':
+        """
+        the whole world - not once part of it is loaded (see community())
+        """
+        assert self.__world__ is None, 'cannot load the whole world once part of it is'
+        state = self.__world_value__('state')
+        state['__all_communities__'] = [
+            self.__community__(community_id)
+            for community_id in self.__world_value__('community_ids')]
+        for community in state['__all_communities__']:
+            community.__world_id__ = state['__world_id__']
+        world = World.__new__(World)
+        world.__setstate__(state)
+        return world
+
+    def people_named(self, prefix: str, limit: int = None) -> List[Person]:
+        """
+        the people whose name starts with prefix (ignoring case), in name order
+        """
+        assert isinstance(prefix, str), 'invalid name prefix'
+        prefix = prefix.casefold()
+        rows = self.__connection__.execute(
+            'SELECT id FROM people WHERE folded_name >= ? AND folded_name < ?'
+            ' ORDER BY folded_name, id LIMIT ?',
+            (prefix, prefix + chr(0x10ffff), -1 if limit is None else limit))
+        return [self.person(person_id) for person_id, in rows.fetchall()]
+
+    def people_born_between(self, start: datetime.date, end: datetime.date) -> List[Person]:
+        """
+        the people born from start up to (not including) end
+        """
+        rows = self.__connection__.execute(
+            'SELECT id FROM people WHERE dob_key >= ? AND dob_key < ? ORDER BY dob_key, id',
+            (Animal.__date_key__(start), Animal.__date_key__(end)))
+        return [self.person(person_id) for person_id, in rows.fetchall()]
+
 
 class World:
     """
@@ -1240,6 +4107,35 @@ class World:
         self.__world_name__ = name
         self.__all_communities__: List[Community] = []
         self.__communities_updated_callback__ = communities_updated_callback
+        # indexes kept current by community_add/remove and Community.family_add/remove
+        self.__families_by_id__: Dict[int, Family] = {}
+        self.__community_by_family_id__: Dict[int, Community] = {}
+        # person-id -> how many of our communities they are a member of
+        self.__member_counts__: Dict[int, int] = {}
+        self.__members_by_id__: Dict[int, Person] = {}
+        # person-id -> member, or former member (until they are garbage-collected)
+        self.__registry__: Dict[int, Person] = weakref.WeakValueDictionary()
+        # (optional) our members sorted by name - for people_named()
+        self.__name_index__: NameIndex = None
+        # by default every member's actions are kept in memory
+        self.__action_retention__: ActionRetention = None
+        # (optional) Action -> member -> the positions in their history they did it at
+        self.__action_index__: Dict[Action, Dict[Person, array]] = None
+        self.__action_counts__: Dict[Action, int] = None
+        # (optional) columnar mirror of our members' state
+        self.__population_store__: PopulationStore = None
+        # (optional) bitmaps of our members' state-flags
+        self.__flag_bitmaps__: FlagBitmaps = None
+        # (optional) secondary indexes used by query()
+        self.__attribute_indexes__: AttributeIndexes = None
+        # (optional) our members' family-tree
+        self.__kinship__: Kinship = None
+        # (optional) the journal our changes are saved to
+        self.__journal__: Journal = None
+        # how many of our ingests (see Ingest) are open
+        self.__ingest_depth__: int = 0
+        # (optional) the database our changes are written (behind) to
+        self.__database__: Database = None
 
     @property
     def id(self) -> int: return self.__world_id__
@@ -1275,22 +4171,97 @@ class World:
 
     def prop_callback(self):
         if self.__communities_updated_callback__ is not None:
-            self.__communities_updated_callback__()
+            Batch.fire(self.__communities_updated_callback__)
+
+    def batch(self) -> Batch:
+        """
+        a context deferring (and de-duplicating) change-callbacks until it closes
+        """
+        return Batch()
 
     def community_add(self, community: Community):
-        assert isinstance(community, Community), 'invalid community'
-        # cannot already be in this world
-        assert community.world_id != self.id, 'cannot add ' + \
-            community.name + ' community: already in this world'
-        # cannot belong to another world already
-        assert community.world_id is None, 'cannot add ' + \
-            community.name + ' community: is in another world'
+        if not self.__is_trusted__():
+            assert isinstance(community, Community), 'invalid community'
+            # cannot already be in this world
+            assert community.world_id != self.id, 'cannot add ' + \
+                community.name + ' community: already in this world'
+            # cannot belong to another world already
+            assert community.world_id is None, 'cannot add ' + \
+                community.name + ' community: is in another world'
         # so we're good to go
         self.all_communities.append(community)
         community.__world_id__ = self.__world_id__
+        community.__world__ = self
+        for family in community.all_families:
+            self.__family_indexed__(family, community)
+        for person in community.members:
+            self.__member_joined__(person)
         message(self.name, 'world: added', community.name, 'community')
         self.prop_callback()
 
+    # whether we are being ingested
+    def __is_trusted__(self) -> bool:
+        return Ingest.trusts(self)
+
+    def ingest(self) -> Ingest:
+        """
+        a context in which adds are not checked one by one, but the whole world is
+        checked (see violations()) when it closes
+        """
+        return Ingest(self)
+
+    def violations(self) -> List[str]:
+        """
+        what (if anything) is inconsistent about this world, its communities and
+        their families
+        """
+        violations = []
+        if len(set(self.all_communities)) != len(self.all_communities):
+            violations.append(self.name + ' world: has a community more than once')
+        community_of_family: Dict[Family, Community] = {}
+        for community in self.all_communities:
+            if not isinstance(community, Community):
+                violations.append(self.name + ' world: invalid community ' + repr(community))
+                continue
+            if community.world_id != self.id or community.__world__ is not self:
+                violations.append(self.name + ' world: ' + community.name +
+                                  ' community does not know it is in this world')
+            for family in community.all_families:
+                other = community_of_family.setdefault(family, community)
+                if other is not community:
+                    violations.append(self.name + ' world: ' + family.name + ' family is in both ' +
+                                      other.name + ' and ' + community.name + ' communities')
+            violations.extend(community.violations())
+        return violations
+
+    def communities_add_many(self, communities: List[Community]):
+        """
+        add communities to this world - all checked before any are added, and our
+        callbacks fired once
+        """
+        communities = list(communities)
+        if not self.__is_trusted__():
+            for community in communities:
+                assert isinstance(community, Community), 'invalid community'
+                assert community.world_id != self.id, 'cannot add ' + \
+                    community.name + ' community: already in this world'
+                assert community.world_id is None, 'cannot add ' + \
+                    community.name + ' community: is in another world'
+            assert len(set(communities)) == len(communities), 'the same community given twice'
+        if not communities:
+            return
+        #
+        self.all_communities.extend(communities)
+        for community in communities:
+            community.__world_id__ = self.__world_id__
+            community.__world__ = self
+            for family in community.all_families:
+                self.__family_indexed__(family, community)
+            for person in community.members:
+                self.__member_joined__(person)
+        message(self.name, 'world: added', len(communities), 'communities')
+        self.prop_callback()
+
     def community_remove(self, community: Community):
         assert isinstance(community, Community), 'invalid community'
         #
@@ -1298,38 +4269,431 @@ class World:
             community.name + ' community: not in this world'
         self.all_communities.remove(community)
         community.__world_id__ = None
+        community.__world__ = None
+        for family in community.all_families:
+            self.__family_unindexed__(family)
+        for person in community.members:
+            self.__member_left__(person)
         message(self.name, 'world: removed', community.name, 'community(!)')
         self.prop_callback()
 
-    def comm_id_of(self, family_id: int) -> int:
+    # only to be called by community_add()/Community.family_add() - keeps the indexes current
+    def __family_indexed__(self, family: Family, community: Community):
+        self.__families_by_id__[family.id] = family
+        self.__community_by_family_id__[family.id] = community
+        self.__kinship_changed__(family.children)
+        self.__pets_joined__(family.pets)
+        if self.__journal__ is not None:
+            self.__journal__.__family_changed__(family)
+            self.__journal__.__community_changed__(community)
+        if self.__database__ is not None:
+            self.__database__.__family_changed__(family)
+            self.__database__.__community_changed__(community)
+
+    # only to be called by community_remove()/Community.family_remove()
+    def __family_unindexed__(self, family: Family):
+        self.__families_by_id__.pop(family.id, None)
+        self.__community_by_family_id__.pop(family.id, None)
+        self.__kinship_changed__(family.children)
+        self.__pets_left__(family.pets)
+        if self.__database__ is not None:
+            # (its row says which community it is in)
+            self.__database__.__family_changed__(family)
+
+    # only to be called by our communities - when they, or their families, change
+    def __family_changed__(self, family: Family):
+        if self.__journal__ is not None:
+            self.__journal__.__family_changed__(family)
+        if self.__database__ is not None:
+            self.__database__.__family_changed__(family)
+
+    def __community_changed__(self, community: Community):
+        if self.__journal__ is not None:
+            self.__journal__.__community_changed__(community)
+        if self.__database__ is not None:
+            self.__database__.__community_changed__(community)
+
+    # only to be called by our families (and us) - when the parents of people change
+    def __kinship_changed__(self, people: List[Person]):
+        if self.__kinship__ is not None:
+            self.__kinship__.invalidate(people)
+
+    # only to be called by our families (and us) - pets are not members, but keep
+    #  their actions as our members do
+    def __pets_joined__(self, pets: List[Animal]):
+        if self.__action_retention__ is not None:
+            for pet in pets:
+                pet.set_action_retention(self.__action_retention__)
+
+    def __pets_left__(self, pets: List[Animal]):
+        if self.__action_retention__ is not None:
+            for pet in pets:
+                pet.set_action_retention(None)
+
+    # only to be called by our communities - a person counts once, however many
+    #  of our communities they are a member of
+    def __member_joined__(self, person: Person):
+        count = self.__member_counts__.get(person.id, 0)
+        self.__member_counts__[person.id] = count + 1
+        if count > 0:
+            return
+        self.__members_by_id__[person.id] = person
+        self.__registry__[person.id] = person
+        if self.__journal__ is not None:
+            self.__journal__.__person_joined__(person)
+        if self.__database__ is not None:
+            self.__database__.__person_joined__(person)
+        if self.__name_index__ is not None:
+            self.__name_index__.add(person)
+        person.__world__ = self
+        if self.__action_retention__ is not None:
+            person.set_action_retention(self.__action_retention__)
+        if self.__action_index__ is not None:
+            self.__index_actions_of__(person)
+        if self.__population_store__ is not None:
+            self.__population_store__.add(person)
+        if self.__flag_bitmaps__ is not None:
+            self.__flag_bitmaps__.update(person)
+        if self.__attribute_indexes__ is not None:
+            self.__attribute_indexes__.add(person)
+
+    def __member_left__(self, person: Person):
+        count = self.__member_counts__[person.id] - 1
+        if count > 0:
+            self.__member_counts__[person.id] = count
+            return
+        del self.__member_counts__[person.id]
+        del self.__members_by_id__[person.id]
+        if self.__name_index__ is not None:
+            self.__name_index__.remove(person)
+        person.__world__ = None
+        if self.__action_retention__ is not None:
+            person.set_action_retention(None)
+        if self.__action_index__ is not None:
+            self.__unindex_actions_of__(person)
+        if self.__population_store__ is not None:
+            self.__population_store__.remove(person)
+        if self.__flag_bitmaps__ is not None:
+            self.__flag_bitmaps__.remove(person)
+        if self.__attribute_indexes__ is not None:
+            self.__attribute_indexes__.remove(person)
+        if self.__database__ is not None:
+            self.__database__.__person_left__(person)
+
+    # only to be called by our members' add_action() - keeps our indexes current
+    def __action_recorded__(self, person: Person, action: Action):
+        if self.__action_index__ is not None:
+            positions = self.__action_index__[action].get(person)
+            if positions is None:
+                positions = self.__action_index__[action][person] = array('I')
+            positions.append(len(person.all_actions) - 1)
+            self.__action_counts__[action] += 1
+        self.__member_changed__(person)
+
+    # only to be called by our members - when their state changes
+    def __member_changed__(self, person: Person):
+        if self.__name_index__ is not None:
+            self.__name_index__.update(person)
+        if self.__journal__ is not None:
+            self.__journal__.__person_changed__(person)
+        if self.__database__ is not None:
+            self.__database__.__person_changed__(person)
+        if self.__population_store__ is not None:
+            self.__population_store__.update(person)
+        if self.__flag_bitmaps__ is not None:
+            self.__flag_bitmaps__.update(person)
+        if self.__attribute_indexes__ is not None:
+            self.__attribute_indexes__.update(person)
+
+    def __index_actions_of__(self, person: Person):
+        for position, action in enumerate(person.all_actions):
+            positions = self.__action_index__[action[0]].get(person)
+            if positions is None:
+                positions = self.__action_index__[action[0]][person] = array('I')
+            positions.append(position)
+            self.__action_counts__[action[0]] += 1
+
+    def __unindex_actions_of__(self, person: Person):
+        for action, people in self.__action_index__.items():
+            positions = people.pop(person, None)
+            if positions is not None:
+                self.__action_counts__[action] -= len(positions)
+
+    @property
+    def has_action_index(self) -> bool: return self.__action_index__ is not None
+
+    def enable_action_index(self):
+        """
+        start (and from now on, maintain) an index of who did what - for who_did() and
+        action_counts(). Indexing existing histories reads through them once
+        """
+        self.__action_index__ = {action: dict() for action in Action}
+        self.__action_counts__ = {action: 0 for action in Action}
+        for person in self.members:
+            self.__index_actions_of__(person)
+
+    def disable_action_index(self):
+        self.__action_index__ = None
+        self.__action_counts__ = None
+
+    @property
+    def population_store(self) -> PopulationStore: return self.__population_store__
+
+    def enable_population_store(self) -> PopulationStore:
+        """
+        start (and from now on, keep in step) a columnar store of our members' state
+        - for vectorized world-wide filters and aggregates
+        """
+        self.__population_store__ = PopulationStore(self.members)
+        return self.__population_store__
+
+    def disable_population_store(self):
+        self.__population_store__ = None
+
+    @property
+    def flag_bitmaps(self) -> FlagBitmaps: return self.__flag_bitmaps__
+
+    def enable_flag_bitmaps(self) -> FlagBitmaps:
+        """
+        start (and from now on, keep current) bitmaps of our members' state-flags
+        - is_alive, is_ill, is_injured, etc. - for who_is()
+        """
+        self.__flag_bitmaps__ = FlagBitmaps(self.members)
+        return self.__flag_bitmaps__
+
+    def disable_flag_bitmaps(self):
+        self.__flag_bitmaps__ = None
+
+    @property
+    def name_index(self) -> NameIndex: return self.__name_index__
+
+    def enable_name_index(self) -> NameIndex:
+        """
+        start (and from now on, keep current) the index people_named() uses
+        """
+        self.__name_index__ = NameIndex(self.__members_by_id__.values())
+        return self.__name_index__
+
+    def disable_name_index(self):
+        self.__name_index__ = None
+
+    @property
+    def attribute_indexes(self) -> AttributeIndexes: return self.__attribute_indexes__
+
+    def enable_attribute_indexes(self) -> AttributeIndexes:
+        """
+        start (and from now on, keep current) the secondary indexes query() uses
+        """
+        self.__attribute_indexes__ = AttributeIndexes(self.members)
+        return self.__attribute_indexes__
+
+    def disable_attribute_indexes(self):
+        self.__attribute_indexes__ = None
+
+    def query(self, gender: Gender = None, hair_color: HairColor = None,
+              is_alive: bool = None, min_age: int = None, max_age: int = None,
+              min_distance: float = None, max_distance: float = None,
+              family: Family = None, community: Community = None,
+              as_of: datetime.date = None):
+        """
+        a (lazy) iterator over the members matching all the given criteria (ages
+        as at as_of - by default, now)
+
+        The smallest candidate set available - the family, the community, or
+        (when enable_attribute_indexes() has been called) an index bucket or
+        range - is picked, and the rest of the criteria are checked per candidate
+        """
+        assert family is None or isinstance(family, Family), 'invalid family'
+        assert community is None or isinstance(
+            community, Community), 'invalid community'
+        as_of_key = Animal.__date_key__(as_of or datetime.datetime.now())
+        # the range of dob-keys giving min_age <= age <= max_age
+        low_dob = None if max_age is None else as_of_key - \
+            (max_age + 1) * 10000 + 1
+        high_dob = None if min_age is None else as_of_key - min_age * 10000
+        #
+        # the candidate sources - (size, function returning the candidates)
+        plans = [(len(self.__members_by_id__), lambda: self.members)]
+        if family is not None:
+            plans.append((family.population, lambda: list(family.members)))
+        if community is not None:
+            plans.append((community.population, lambda: community.members))
+        indexes = self.__attribute_indexes__
+        if indexes is not None:
+            for name, value in (('gender', gender), ('hair_color', hair_color), ('is_alive', is_alive)):
+                if value is not None:
+                    ids = indexes.ids_with(name, value)
+                    plans.append((len(ids), lambda ids=ids: self.__people__(ids)))
+            if low_dob is not None or high_dob is not None:
+                start, stop = indexes.dob_range(low_dob, high_dob)
+                plans.append((stop - start, lambda start=start, stop=stop:
+                              self.__people__(indexes.dob_ids(start, stop))))
+            if min_distance is not None or max_distance is not None:
+                start, stop = indexes.distance_range(min_distance, max_distance)
+                plans.append((stop - start, lambda start=start, stop=stop:
+                              self.__people__(indexes.distance_ids(start, stop))))
+        candidates = min(plans, key=lambda plan: plan[0])[1]()
+        #
+        def matches(person: Person) -> bool:
+            if gender is not None and person.gender != gender:
+                return False
+            if hair_color is not None and person.hair_color != hair_color:
+                return False
+            if is_alive is not None and person.is_alive != is_alive:
+                return False
+            if low_dob is not None or high_dob is not None:
+                dob_key = Animal.__date_key__(person.dob)
+                if low_dob is not None and dob_key < low_dob:
+                    return False
+                if high_dob is not None and dob_key > high_dob:
+                    return False
+            if min_distance is not None and person.distance_travelled < min_distance:
+                return False
+            if max_distance is not None and person.distance_travelled > max_distance:
+                return False
+            if family is not None and person not in family.members:
+                return False
+            if community is not None and not community.has_member(person):
+                return False
+            return True
+        return (person for person in candidates if matches(person))
+
+    def __people__(self, person_ids) -> List[Person]:
+        return [self.__members_by_id__[person_id] for person_id in person_ids]
+
+    @property
+    def kinship(self) -> Kinship: return self.__kinship__
+
+    def enable_kinship(self) -> Kinship:
+        """
+        work out (and from now on, keep current) our members' family-tree
+        """
+        self.__kinship__ = Kinship(self)
+        return self.__kinship__
+
+    def disable_kinship(self):
+        self.__kinship__ = None
+
+    def person_by_id(self, person_id: int) -> Person:
+        """
+        the member - or former member, while anything still refers to them - with
+        this ID (or None)
+        """
+        assert isinstance(person_id, int), 'invalid person ID'
+        return self.__registry__.get(person_id)
+
+    def people_named(self, prefix: str, limit: int = None) -> List[Person]:
+        """
+        the members whose name starts with prefix (ignoring case), in name order -
+        searching them all, unless the name index is enabled
+        """
+        assert isinstance(prefix, str), 'invalid name prefix'
+        if self.__name_index__ is None:
+            prefix = prefix.casefold()
+            matches = sorted([(person.name.casefold(), person.id)
+                              for person in self.__members_by_id__.values()
+                              if person.name.casefold().startswith(prefix)])
+            return [self.__members_by_id__[person_id] for _, person_id in matches[:limit]]
+        return [self.__members_by_id__[person_id]
+                for person_id in self.__name_index__.ids_starting(prefix, limit)]
+
+    def who_is(self, **flags) -> List[Person]:
+        """
+        the members matching all the flags - e.g. who_is(is_ill=True, is_injured=False,
+        is_alive=True)
+        """
+        assert self.__flag_bitmaps__ is not None, 'flag bitmaps not enabled'
+        return [self.__members_by_id__[person_id]
+                for person_id in self.__flag_bitmaps__.person_ids(**flags)]
+
+    def who_feels(self, *emotions, any_of: bool = False) -> List[Person]:
+        """
+        the members feeling all (or with any_of, any) of the emotions - over the
+        population store's packed emotion-masks when it is enabled
+        """
+        wanted = EmotionSet.mask_of(emotions)
+        if self.__population_store__ is not None:
+            store = self.__population_store__
+            masks = store.column('emotions')
+            person_ids = store.column('person_id')
+        else:
+            members = self.members
+            masks = [person.emotion_mask for person in members]
+            person_ids = [person.id for person in members]
+        if any_of:
+            matches = [mask & wanted != 0 for mask in masks]
+        else:
+            matches = [mask & wanted == wanted for mask in masks]
+        return [self.__members_by_id__[person_id]
+                for person_id in itertools.compress(person_ids, matches)]
+
+    def who_did(self, action: Action) -> List[Person]:
+        assert isinstance(action, Action), 'invalid action'
+        assert self.has_action_index, 'action index not enabled'
+        return list(self.__action_index__[action])
+
+    def action_positions(self, person: Person, action: Action) -> List[int]:
+        """
+        where in person's all_actions they did action
+        """
+        assert isinstance(person, Person), 'invalid person'
+        assert isinstance(action, Action), 'invalid action'
+        assert self.has_action_index, 'action index not enabled'
+        return list(self.__action_index__[action].get(person, ()))
+
+    def action_counts(self) -> Dict[Action, int]:
+        assert self.has_action_index, 'action index not enabled'
+        return {action: count for action, count in self.__action_counts__.items() if count > 0}
+
+    @property
+    def action_retention(self) -> ActionRetention: return self.__action_retention__
+
+    def set_action_retention(self, keep_last: int = None, directory: str = None,
+                             spill_batch: int = 256):
+        """
+        keep (only) the last keep_last actions of each member (and pet) in memory,
+        spilling older ones to segment files in directory - or keep_last=None to keep
+        them all
+        """
+        retention = None
+        if keep_last is not None:
+            retention = ActionRetention(
+                keep_last=keep_last, directory=directory, spill_batch=spill_batch)
+        self.__action_retention__ = retention
+        for community in self.all_communities:
+            for person in community.members:
+                person.set_action_retention(retention)
+        for pet in self.pets:
+            pet.set_action_retention(retention)
+
+    def comm_id_of(self, family_id: int) -> Community:
         assert isinstance(family_id, int), 'invalid family ID'
         #
-        comms = [
-            com for com in self.all_communities for fam in com.all_families if fam.id == family_id]
-        if len(comms) > 0:
-            return comms[0]
-        return None
+        return self.__community_by_family_id__.get(family_id)
 
-    def community_of(self, family_or_person_or_pet) -> Community:
-        assert isinstance(family_or_person_or_pet, (Family, Animal)
-                          ), ' invalid family, person or animal'
-        # community must be in this world
+    def family_by_id(self, family_id: int) -> Family:
+        assert isinstance(family_id, int), 'invalid family ID'
+        #
+        return self.__families_by_id__.get(family_id)
+
+    def __family_id_of__(self, family_or_person_or_pet) -> int:
         family_id = None
         if isinstance(family_or_person_or_pet, Animal) and not isinstance(family_or_person_or_pet, Person):
             family_id = family_or_person_or_pet.family_id
         elif isinstance(family_or_person_or_pet, Person):
-            # family_id, if this person is a child in a family
-            family_id = family_or_person_or_pet.family_id
-            if family_id is None:
-                # or maybe they're a parent in a family?
-                family_ids = family_or_person_or_pet.parent_of_families_id
-                if len(family_ids) > 0:
-                    # just pick any family they're a parent of...
-                    family_id = next(iter(family_ids))
+            # the family they're a child in - or else the first they're a parent of
+            family_id = family_or_person_or_pet.home_family_id
         elif isinstance(family_or_person_or_pet, Family):
             family_id = family_or_person_or_pet.id
         assert family_id is not None, 'cannot find family ID for person ' + \
             family_or_person_or_pet.name
+        return family_id
+
+    def community_of(self, family_or_person_or_pet) -> Community:
+        assert isinstance(family_or_person_or_pet, (Family, Animal)
+                          ), ' invalid family, person or animal'
+        # community must be in this world
+        family_id = self.__family_id_of__(family_or_person_or_pet)
         com = self.comm_id_of(family_id)
         assert com is not None, 'community for person ' + \
             family_or_person_or_pet.name + ' is not in this world'
@@ -1338,17 +4702,46 @@ class World:
     def family_of(self, person_or_pet) -> Family:
         assert isinstance(person_or_pet, Animal), 'invalid person or animal'
         #
-        comm = self.community_of(person_or_pet)
-        # assert comm is not None, 'person/pet is not in a community'
-        # so we can hand-off this search to the community
-        return comm.family_of(person_or_pet)
+        family_id = self.__family_id_of__(person_or_pet)
+        family = self.family_by_id(family_id)
+        assert family is not None, 'family for ' + \
+            (person_or_pet.name or person_or_pet.animal_type) + ' is not in this world'
+        return family
 
     @property
     def population(self) -> int:
-        pop: int = 0
-        for com in self.all_communities:
-            pop += com.population
-        return pop
+        return len(self.__member_counts__)
+
+    @property
+    def members(self) -> List[Person]:
+        return list(self.__members_by_id__.values())
+
+    @property
+    def pets(self) -> List[Animal]:
+        return [pet for community in self.all_communities for pet in community.pets]
+
+    def ages(self, as_of: datetime.date = None) -> array:
+        """
+        the ages of all our members (in the order of members), as at as_of (by default, now)
+        """
+        return Animal.ages_of(self.members, as_of=as_of)
+
+    def actions_between(self, start: float = None, end: float = None):
+        """
+        the (time, person-or-pet, action) of the actions of everyone (and every pet)
+        in our communities from start up to (not including) end - in time order
+        """
+        return ActionHistory.merged_between(self.members + self.pets, start, end)
+
+    # the class ID counters - saved along with a world, so that once it is re-loaded
+    #  new instances continue to get unique IDs
+    @staticmethod
+    def __id_counters__() -> tuple:
+        return (Community.__community_id__, Family.__family_id__, Person.__last_person_id__)
+
+    @staticmethod
+    def __set_id_counters__(counters):
+        Community.__community_id__, Family.__family_id__, Person.__last_person_id__ = counters
 
     def store_to_file(self, filename: str):
         assert isinstance(filename, str), 'invalid file name'
@@ -1360,16 +4753,126 @@ class World:
         # - and the current values of:
         #   - Community.__community_id__
         #   - Family.__family_id__
-        #   - Person.__person_id__
+        #   - Person.__last_person_id__
         # so that upon successful re-load we can continue generating new instances
         # with unique IDs
         #
-        with open(filename, 'wb') as file_to_store:
-            pickle.dump([self,
-                         Community.__community_id__,
-                         Family.__family_id__,
-                         Person.__person_id__,
-                         ], file_to_store)
+        # (replacing filename once written - it may be the snapshot we were loaded from)
+        Snapshot.__replace__(filename, lambda file_to_store: pickle.dump(
+            [self, *World.__id_counters__()], file_to_store))
+
+    def store_to_snapshot(self, filename: str):
+        """
+        save to filename in the (binary) Snapshot format - see load_from_snapshot()
+        """
+        assert isinstance(filename, str) and filename.strip() != '', 'invalid file name'
+        Snapshot.write(self, filename.strip())
+
+    @classmethod
+    def load_from_snapshot(cls, filename: str) -> 'World':
+        """
+        load a world saved by store_to_snapshot() - its members' action histories are
+        only read as they are used
+        """
+        snapshot = Snapshot(filename)
+        world = snapshot.world()
+        # set the class ID counters
+        World.__set_id_counters__(snapshot.counters)
+        return world
+
+    def store_to_shards(self, directory: str, processes: int = None):
+        """
+        save to directory as a manifest plus a shard per community (see Shards) -
+        written in parallel
+        """
+        assert isinstance(directory, str) and directory.strip() != '', 'invalid directory'
+        Shards.write(self, directory.strip(), processes)
+
+    @classmethod
+    def load_from_shards(cls, directory: str, threads: int = None) -> 'World':
+        assert isinstance(directory, str), 'invalid directory'
+        world, counters = Shards.read(directory, threads)
+        # set the class ID counters
+        World.__set_id_counters__(counters)
+        return world
+
+    def export_stream(self, fp):
+        """
+        write this world to (text) file fp as newline-delimited JSON - a record per
+        line, for each community, person, family and pet (see RecordStream)
+        """
+        for record in RecordStream.records(self):
+            fp.write(json.dumps(record))
+            fp.write('\n')
+
+    @classmethod
+    def import_stream(cls, fp) -> 'World':
+        """
+        read a world written by export_stream() from (text) file fp - a line at a time
+        """
+        world, counters = RecordStream.world_from(
+            json.loads(line) for line in fp if line.strip() != '')
+        # set the class ID counters
+        World.__set_id_counters__(counters)
+        return world
+
+    @property
+    def database(self) -> Database: return self.__database__
+
+    def attach_database(self, filename: str, batch_size: int = 1000) -> Database:
+        """
+        write this world to the (SQLite) database in filename - and from now on,
+        write our changes to it (behind, in batches - see Database)
+        """
+        self.detach_database()
+        self.__database__ = Database(filename, batch_size)
+        self.__database__.__attach__(self, write_all=True)
+        return self.__database__
+
+    def detach_database(self):
+        if self.__database__ is not None:
+            self.__database__.close()
+        self.__database__ = None
+
+    @classmethod
+    def load_from_database(cls, filename: str, batch_size: int = 1000) -> 'World':
+        """
+        load the world in the (SQLite) database in filename - which its changes
+        are then written (behind) to. Action histories are only read as used
+        """
+        database = Database(filename, batch_size)
+        world = database.world()
+        # set the class ID counters
+        World.__set_id_counters__(database.counters)
+        world.__database__ = database
+        database.__attach__(world, write_all=False)
+        return world
+
+    @property
+    def journal(self) -> Journal: return self.__journal__
+
+    def start_journal(self, filename: str, compact_size: int = 4 * 1024 * 1024) -> Journal:
+        """
+        save to filename (as store_to_file does) - and from now on, journal.save()
+        appends just what has changed since
+        """
+        self.stop_journal()
+        self.__journal__ = Journal(self, filename, compact_size)
+        return self.__journal__
+
+    def stop_journal(self):
+        if self.__journal__ is not None:
+            self.__journal__.close()
+        self.__journal__ = None
+
+    @classmethod
+    def load_from_journal(cls, filename: str) -> 'World':
+        """
+        load the base snapshot in filename, and replay its journal - e.g. after a crash
+        """
+        world = cls.load_from_file(filename)
+        Journal.replay(world, filename + Journal.__suffix__)
+        return world
 
     @classmethod
     def load_from_file(cls, filename: str) -> 'World':
@@ -1378,9 +4881,7 @@ class World:
             data_list = pickle.load(file_to_load)
         world = data_list[0]
         # set the class ID counters
-        Community.__community_id__ = data_list[1]
-        Family.__family_id__ = data_list[2]
-        Person.__person_id__ = data_list[3]
+        World.__set_id_counters__(data_list[1:4])
         return world
 
     # to help in pickling
@@ -1388,8 +4889,71 @@ class World:
         state = self.__dict__.copy()
         if hasattr(self, '__communities_updated_callback__'):
             del state['__communities_updated_callback__']
+        # the indexes are re-built when un-pickled
+        state.pop('__families_by_id__', None)
+        state.pop('__community_by_family_id__', None)
+        state.pop('__member_counts__', None)
+        state.pop('__members_by_id__', None)
+        state.pop('__registry__', None)
+        state.pop('__journal__', None)
+        state.pop('__ingest_depth__', None)
+        state.pop('__database__', None)
+        # just remember whether we had an action index - it is re-built when un-pickled
+        state['__action_index__'] = self.__action_index__ is not None
+        state.pop('__action_counts__', None)
+        state['__population_store__'] = self.__population_store__ is not None
+        state['__flag_bitmaps__'] = self.__flag_bitmaps__ is not None
+        state['__attribute_indexes__'] = self.__attribute_indexes__ is not None
+        state['__name_index__'] = self.__name_index__ is not None
+        state['__kinship__'] = self.__kinship__ is not None
         return state
 
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__communities_updated_callback__ = None
+        if not hasattr(self, '__action_retention__'):
+            self.__action_retention__ = None
+        had_action_index = getattr(self, '__action_index__', False)
+        self.__action_index__ = None
+        self.__action_counts__ = None
+        had_population_store = getattr(self, '__population_store__', False)
+        self.__population_store__ = None
+        had_flag_bitmaps = getattr(self, '__flag_bitmaps__', False)
+        self.__flag_bitmaps__ = None
+        had_attribute_indexes = getattr(self, '__attribute_indexes__', False)
+        self.__attribute_indexes__ = None
+        had_kinship = getattr(self, '__kinship__', False)
+        self.__kinship__ = None
+        self.__journal__ = None
+        self.__database__ = None
+        self.__ingest_depth__ = 0
+        self.__families_by_id__ = {}
+        self.__community_by_family_id__ = {}
+        self.__member_counts__ = {}
+        self.__members_by_id__ = {}
+        self.__registry__ = weakref.WeakValueDictionary()
+        # (built in one go below, rather than a member at a time)
+        had_name_index = getattr(self, '__name_index__', False)
+        self.__name_index__ = None
+        for community in self.all_communities:
+            community.__world__ = self
+            for family in community.all_families:
+                self.__family_indexed__(family, community)
+            for person in community.members:
+                self.__member_joined__(person)
+        if had_name_index:
+            self.enable_name_index()
+        if had_action_index:
+            self.enable_action_index()
+        if had_population_store:
+            self.enable_population_store()
+        if had_flag_bitmaps:
+            self.enable_flag_bitmaps()
+        if had_attribute_indexes:
+            self.enable_attribute_indexes()
+        if had_kinship:
+            self.enable_kinship()
+
 
 def message(*messages):
     if __name__ != '__main__':